@@ -1,50 +1,128 @@
-from flask import Flask, request, jsonify, session, send_file, render_template
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify, make_response, session, send_file, render_template, stream_with_context, url_for
+from db_config import TunedSQLAlchemy
 from werkzeug.utils import secure_filename
 from flask.views import MethodView
 from datetime import datetime, timedelta
 import os
 import uuid
 from flask_cors import CORS
-from flask_migrate import Migrate
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+from cache import ResponseCache, backend_from_config
+from scheduler import PeriodicWorker, sender_from_config
+from storage import BlobStore, UploadError
+from sessions import load_secret_key, session_interface_from_config
+from passwords import HasherBusy, PasswordHasher
+from profiler import QueryProfiler
+from portfolio_import import IMPORT_FORMATS, ImportFormatError, InvalidRow, format_for, iter_rows
+from seed_data import generate_portfolio
+from downloads import send_stored_file
+from renditions import RenditionPool, RenditionUnsupported, rendition_dir
 import os
 from werkzeug.utils import secure_filename
 from datetime import datetime
 from datetime import date
+from functools import wraps
+import hashlib
+import shutil
+import csv
+import io
+import json
+import random
+import threading
+import time
+from itertools import islice
+import click
+from flask.cli import with_appcontext
+
+
+class Config:
+    # Must be identical in every worker; when unset it is read from instance/secret_key
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///property_management.db'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # WAL, pragmas and pool policy for the SQLite engine (see db_config.py)
+    SQLITE_TUNING = True
+    SQLITE_POOL_CLASS = 'queue'
+    SQLITE_POOL_SIZE = 10
+    # Per-user response cache; set RESPONSE_CACHE_REDIS_URL to share it between workers
+    RESPONSE_CACHE_TTL = 60
+    RESPONSE_CACHE_REDIS_URL = os.environ.get('RESPONSE_CACHE_REDIS_URL')
+    # Background notification rule run and outbox delivery (see scheduler.py)
+    NOTIFICATION_WORKERS = True
+    NOTIFICATION_RULES_INTERVAL = 60 * 60
+    NOTIFICATION_DELIVERY_INTERVAL = 60
+    NOTIFICATION_BATCH_SIZE = 100
+    # A failed message is retried after NOTIFICATION_RETRY_DELAY seconds, doubling
+    # each time, and left undelivered after NOTIFICATION_MAX_ATTEMPTS attempts
+    NOTIFICATION_MAX_ATTEMPTS = 8
+    NOTIFICATION_RETRY_DELAY = 60
+    # Every worker process runs the delivery loop; a claimed row is hidden from
+    # the others for this many seconds while it is being sent
+    NOTIFICATION_CLAIM_TIMEOUT = 10 * 60
+    NOTIFICATION_SMTP_HOST = os.environ.get('NOTIFICATION_SMTP_HOST')
+    # Documents are stored content-addressed under UPLOAD_FOLDER (see storage.py)
+    UPLOAD_FOLDER = os.path.join(os.getcwd(), 'static/documents')
+    DOCUMENT_MAX_SIZE = 25 * 1024 * 1024
+    DOCUMENT_CHUNK_SIZE = 64 * 1024
+    # Downloads: None serves files from Python (os.sendfile under gunicorn/uWSGI);
+    # 'x-sendfile' or 'x-accel-redirect' hands them to the reverse proxy
+    DOCUMENT_SENDFILE = os.environ.get('DOCUMENT_SENDFILE') or None
+    DOCUMENT_ACCEL_PREFIX = '/protected/documents/'
+    DOCUMENT_MAX_AGE = 24 * 60 * 60
+    # Thumbnails and previews are rendered on a process pool (see renditions.py);
+    # RENDITION_FOLDER defaults to <static folder>/renditions
+    RENDITIONS_ENABLED = True
+    RENDITION_WORKERS = 2
+    # Server-side sessions (see sessions.py): 'sqlite' shares them between workers,
+    # 'memory' keeps them in this process; SESSION_SQLITE_PATH defaults to instance/sessions.db
+    SESSION_BACKEND = 'sqlite'
+    SESSION_SQLITE_PATH = None
+    SESSION_CACHE_SIZE = 4096
+    SESSION_CACHE_TTL = 60
+    SESSION_SWEEP_INTERVAL = 15 * 60
+    # Password KDF (see passwords.py); stored hashes are upgraded on login when these change
+    PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_MAX_PENDING = 32
+    # Rows written per transaction by /api/import and `flask import-portfolio`
+    IMPORT_BATCH_SIZE = 500
+    # Per-request query profiling (see profiler.py): Server-Timing headers, /api/_metrics,
+    # and warnings for statements repeated more than the threshold or slower than the limit.
+    # Off in production: the headers and metrics expose endpoint timings and SQL shapes
+    PROFILER_ENABLED = False
+    PROFILER_SERVER_TIMING = False
+    PROFILER_N_PLUS_ONE_THRESHOLD = 10
+    PROFILER_SLOW_QUERY_MS = 250
+    # /api/_metrics and /api/cache/stats answer 404 unless this is set
+    METRICS_ENABLED = False
 
-
-app = Flask(__name__, template_folder='Templates')
-CORS(app)
-
-app.config['SECRET_KEY'] = os.urandom(24)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///property_management.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = 'uploads'
-UPLOAD_FOLDER = os.path.join('static', 'images', 'properties')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 
-UPLOAD_FOLDER = os.path.join(os.getcwd(), 'static/documents')
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-
-
-# Make sure the upload directory exists
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-
-db = SQLAlchemy(app)
-app.app_context().push()
-migrate = Migrate(app, db)
+db = TunedSQLAlchemy()
+response_cache = ResponseCache()
+rendition_pool = RenditionPool()
+password_hasher = PasswordHasher()
+query_profiler = QueryProfiler()
 # Helper functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def receive_document_upload():
+    """Stream the 'file' part of the request into the document store.
+
+    Returns (form fields, client filename, stored blob); raises UploadError.
+    request.files must not be touched first, it would buffer the whole body.
+    """
+    document_store = current_app.extensions['document_store']
+    return document_store.receive_multipart(request.stream, request.content_type or '', accept=allowed_file)
+
+def as_date(value):
+    """Date columns may still hold the datetime a view assigned before the flush"""
+    return value.date() if isinstance(value, datetime) else value
+
 def validate_dates(start_date, end_date):
     try:
         start = datetime.strptime(start_date, '%Y-%m-%d')
@@ -65,10 +143,35 @@ class User(db.Model):
     properties = db.relationship('Property', backref='owner', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    @classmethod
+    def get_cached(cls, user_id):
+        """Load a user without a SELECT when this process has its row in the session cache.
+
+        password_hash is never cached: other workers cannot evict this cache
+        after a reset, so the hash is loaded from the database on first access.
+        """
+        cache = current_app.session_interface.cache
+        key = f"user:{user_id}"
+        columns = cache.get(key)
+        if columns is not None:
+            user = cls(**columns)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+        user = db.session.get(cls, user_id)
+        if user is not None:
+            cache.set(key, {column.key: getattr(user, column.key) for column in cls.__table__.columns
+                            if column.key != 'password_hash'},
+                      current_app.config['SESSION_CACHE_TTL'])
+        return user
+
+    @classmethod
+    def forget_cached(cls, user_id):
+        current_app.session_interface.cache.delete(f"user:{user_id}")
 
     @classmethod
     def create(cls, full_name, email, password, phone_number):
@@ -84,6 +187,9 @@ class User(db.Model):
 
 class Property(db.Model):
     __tablename__ = 'properties'
+    __table_args__ = (
+        db.Index('ix_properties_user_id_occupancy_status', 'user_id', 'occupancy_status'),
+    )
     
     property_id = db.Column(db.String(20), primary_key=True, default=lambda: str(uuid.uuid4())[:20])
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -100,6 +206,8 @@ class Property(db.Model):
     rent_per_month = db.Column(db.Float, nullable=False)
     units = db.Column(db.Integer, nullable=False)
     image = db.Column(db.String(255))
+    # Uploaded photo in the document store; renditions are keyed by the same hash
+    image_hash = db.Column(db.String(64))
 
     def add_occupancy(self, tenant_data):
         if self.occupancy_status == 'occupied':
@@ -128,36 +236,27 @@ class Property(db.Model):
                 'payment_percentage': 0,
                 'overdue_amount': 0
             }
-            
-        today = datetime.now().date()
-        total_paid = sum(p.amount for p in self.current_occupancy.payments if p.status == 'paid')
-        total_due = sum(p.amount for p in self.current_occupancy.payments if p.status == 'due')
-        
-        # Calculate overdue amount (due payments with due_date < today)
-        overdue_amount = sum(
-            p.amount 
-            for p in self.current_occupancy.payments 
-            if p.status == 'due' and p.due_date < today
-        )
+
+        from income_analytics import analyze
+        income = analyze(load_ledger(Payment.occupancy_id == self.current_occupancy.occupancy_id))
+        total_rent = self.current_occupancy.total_rent
 
         return {
-            'total_rent': self.current_occupancy.total_rent,
-            'total_paid': total_paid,
-            'total_due': total_due,
-            'payment_percentage': (total_paid / self.current_occupancy.total_rent * 100),
-            'overdue_amount': overdue_amount,
-            'overdue_payments': [
-                {
-                    'amount': float(p.amount),
-                    'due_date': p.due_date.strftime('%Y-%m-%d')
-                }
-                for p in self.current_occupancy.payments
-                if p.status == 'due' and p.due_date < today
-            ]
+            'total_rent': total_rent,
+            'total_paid': income['total_paid'],
+            'total_due': income['total_due'],
+            'payment_percentage': (income['total_paid'] / total_rent * 100) if total_rent else 0,
+            'overdue_amount': income['overdue_amount'],
+            'overdue_payments': income['overdue_payments'],
+            'aging': income['aging'],
+            'monthly_cashflow': income['monthly_cashflow']
         }
 
 class Occupancy(db.Model):
     __tablename__ = 'occupancy'
+    __table_args__ = (
+        db.Index('ix_occupancy_property_id', 'property_id'),
+    )
     
     occupancy_id = db.Column(db.Integer, primary_key=True)
     property_id = db.Column(db.String(20), db.ForeignKey('properties.property_id'))
@@ -167,22 +266,37 @@ class Occupancy(db.Model):
     lease_start_date = db.Column(db.Date, nullable=False)
     lease_end_date = db.Column(db.Date, nullable=False)
     total_rent = db.Column(db.Float, nullable=False)
-    payments = db.relationship('Payment', backref='occupancy', lazy=True)
+    payments = db.relationship('Payment', backref='occupancy', lazy=True, order_by='Payment.payment_id')
 
-    def generate_payment_schedule(self, number_of_payments):
+    def build_payment_schedule(self, number_of_payments, statuses=()):
+        """Compute the payment rows of an evenly split lease, one every 30 days"""
+        number_of_payments = int(number_of_payments)
         payment_amount = self.total_rent / number_of_payments
         start_date = self.lease_start_date
-        
-        for i in range(number_of_payments):
-            due_date = start_date + timedelta(days=(30 * i))
-            payment = Payment(
-                occupancy_id=self.occupancy_id,
-                amount=payment_amount,
-                due_date=due_date,
-                status='due'
-            )
-            db.session.add(payment)
-        db.session.commit()
+        if isinstance(start_date, datetime):
+            start_date = start_date.date()
+
+        due_dates = [start_date + timedelta(days=(30 * i)) for i in range(number_of_payments)]
+        payment_statuses = list(statuses[:number_of_payments])
+        payment_statuses += ['due'] * (number_of_payments - len(payment_statuses))
+
+        return [
+            {
+                'occupancy_id': self.occupancy_id,
+                'amount': payment_amount,
+                'due_date': due_date,
+                'status': status
+            }
+            for due_date, status in zip(due_dates, payment_statuses)
+        ]
+
+    def generate_payment_schedule(self, number_of_payments, statuses=(), commit=True):
+        """Insert the payment schedule with a single executemany and return its rows"""
+        schedule = self.build_payment_schedule(number_of_payments, statuses)
+        Payment.bulk_insert(schedule)
+        if commit:
+            db.session.commit()
+        return schedule
 
     def to_dict(self):
         return {
@@ -196,6 +310,9 @@ class Occupancy(db.Model):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_occupancy_id_status_due_date', 'occupancy_id', 'status', 'due_date'),
+    )
     
     payment_id = db.Column(db.Integer, primary_key=True)
     occupancy_id = db.Column(db.Integer, db.ForeignKey('occupancy.occupancy_id'))
@@ -203,18 +320,174 @@ class Payment(db.Model):
     due_date = db.Column(db.Date, nullable=False)
     status = db.Column(db.String(20), default='due')
 
+    STATUSES = ('due', 'paid')
+
     def mark_as_paid(self):
-        self.status = 'paid'
-        db.session.commit()
+        """Mark paid in the caller's transaction, keeping the owner's summaries in step"""
+        owner_id = db.session.query(Property.user_id).join(Occupancy).filter(
+            Occupancy.occupancy_id == self.occupancy_id
+        ).scalar()
+        return Payment.update_statuses(owner_id, {self.payment_id: 'paid'})
+
+    @classmethod
+    def update_statuses(cls, owner_id, changes):
+        """Apply {payment_id: status} to one owner's payments inside the caller's transaction.
+
+        Ownership is checked with one joined query and every changed row is
+        written by a single UPDATE; the owner's summary, income rollup and due
+        events follow. Returns ({payment_id: 'updated' | 'unchanged' |
+        'not_found'}, ids of the properties that changed).
+        """
+        rows = (
+            db.session.query(cls.payment_id, cls.amount, cls.due_date, cls.status, Occupancy.property_id)
+            .join(Occupancy, cls.occupancy_id == Occupancy.occupancy_id)
+            .join(Property, Occupancy.property_id == Property.property_id)
+            .filter(Property.user_id == owner_id, cls.payment_id.in_(list(changes)))
+            .all()
+        )
+
+        results = dict.fromkeys(changes, 'not_found')
+        changed = {}
+        collected = pending = 0
+        rollup_shifts = {}
+        for payment_id, amount, due_date, status, property_id in rows:
+            new_status = changes[payment_id]
+            if status == new_status:
+                results[payment_id] = 'unchanged'
+                continue
+            results[payment_id] = 'updated'
+            changed[payment_id] = new_status
+            # Only 'paid' counts as collected and only 'due' as pending; rows
+            # stored with any other status count as neither
+            collected_shift = amount * ((new_status == 'paid') - (status == 'paid'))
+            pending_shift = amount * ((new_status == 'due') - (status == 'due'))
+            collected += collected_shift
+            pending += pending_shift
+            period = (property_id, as_date(due_date).replace(day=1))
+            shift = rollup_shifts.get(period, (0, 0))
+            rollup_shifts[period] = (shift[0] + collected_shift, shift[1] + pending_shift)
+
+        if not changed:
+            return results, set()
+
+        db.session.query(cls).filter(cls.payment_id.in_(list(changed))).update(
+            {cls.status: db.case(changed, value=cls.payment_id)}, synchronize_session='fetch'
+        )
+        after = Dashboard.empty_totals()
+        after.update(total_income=collected, total_pending=pending)
+        Dashboard.apply_delta(owner_id, Dashboard.empty_totals(), after)
+        IncomeRollup.shift(rollup_shifts)
+
+        properties = {property_id for property_id, _ in rollup_shifts}
+        for property_id in properties:
+            DueEvent.refresh_property(property_id)
+        DataVersion.bump(owner_id)
+        return results, properties
+
+    @classmethod
+    def bulk_insert(cls, rows):
+        """Insert payment row dicts in one statement, bypassing per-object unit of work"""
+        if rows:
+            db.session.execute(db.insert(cls), rows)
+
+    @classmethod
+    def reconcile_schedule(cls, occupancy_id, rows):
+        """Make an occupancy's payments match the submitted schedule with the fewest writes.
+
+        Submitted rows are matched to existing payments by due date (in
+        payment_id order where a date repeats); matched rows keep their id and
+        are only updated when amount or status differ, the rest are inserted or
+        deleted. Returns True when any payment row was written.
+        """
+        existing = {}
+        for payment_id, due_date, amount, status in (
+            db.session.query(cls.payment_id, cls.due_date, cls.amount, cls.status)
+            .filter(cls.occupancy_id == occupancy_id)
+            .order_by(cls.payment_id)
+        ):
+            existing.setdefault(as_date(due_date), []).append((payment_id, amount, status))
+
+        updates = []
+        inserts = []
+        for row in rows:
+            if row['status'] not in cls.STATUSES:
+                raise ValueError(f"Invalid payment status: {row['status']}")
+            matches = existing.get(row['due_date'])
+            if not matches:
+                inserts.append(dict(row, occupancy_id=occupancy_id))
+                continue
+            payment_id, amount, status = matches.pop(0)
+            if (amount, status) != (row['amount'], row['status']):
+                updates.append({'payment_id': payment_id, 'amount': row['amount'], 'status': row['status']})
+        deletes = [payment_id for matches in existing.values() for payment_id, _, _ in matches]
+
+        if updates:
+            db.session.execute(db.update(cls), updates)
+        if deletes:
+            cls.query.filter(cls.payment_id.in_(deletes)).delete(synchronize_session=False)
+        cls.bulk_insert(inserts)
+        return bool(updates or inserts or deletes)
+
+    @staticmethod
+    def schedule_to_dict(schedule):
+        return [{
+            'due_date': row['due_date'].strftime('%Y-%m-%d'),
+            'amount': row['amount'],
+            'status': row['status']
+        } for row in schedule]
 
 class Document(db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_documents_property_id', 'property_id'),
+        db.Index('ix_documents_content_hash', 'content_hash'),
+    )
     
     document_id = db.Column(db.Integer, primary_key=True)
     property_id = db.Column(db.String(20), db.ForeignKey('properties.property_id'))
     title = db.Column(db.String(200), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
     upload_date = db.Column(db.Date, default=datetime.utcnow)
+    # Set for content-addressed uploads; older rows only have file_path
+    filename = db.Column(db.String(255))
+    content_hash = db.Column(db.String(64))
+    file_size = db.Column(db.Integer)
+
+    @classmethod
+    def from_blob(cls, property_id, title, filename, blob):
+        filename = secure_filename(filename)
+        return cls(
+            property_id=property_id,
+            title=title or filename,
+            file_path=blob.path,
+            filename=filename,
+            content_hash=blob.digest,
+            file_size=blob.size
+        )
+
+    def release_file(self):
+        """Remove the stored file once no document references it; call after the row is deleted"""
+        if self.content_hash is None:
+            if os.path.exists(self.file_path):
+                os.remove(self.file_path)
+        else:
+            release_blob(self.content_hash)
+
+    def download(self):
+        """Serve the file with validators and Range support; raises FileNotFoundError"""
+        return send_stored_file(
+            self.file_path,
+            self.filename or os.path.basename(self.file_path),
+            size=self.file_size,
+            etag=self.content_hash,
+            last_modified=self.upload_date if self.content_hash else None,
+            # Content-addressed files never change under a document id
+            max_age=current_app.config['DOCUMENT_MAX_AGE'] if self.content_hash else 0,
+            offload=current_app.config['DOCUMENT_SENDFILE'],
+            root=current_app.config['UPLOAD_FOLDER'],
+            accel_prefix=current_app.config['DOCUMENT_ACCEL_PREFIX'],
+            chunk_size=current_app.config['DOCUMENT_CHUNK_SIZE']
+        )
 
     def to_dict(self):
         return {
@@ -223,8 +496,40 @@ class Document(db.Model):
             'upload_date': self.upload_date.strftime('%Y-%m-%d')
         }
 
+class RenditionJob(db.Model):
+    """Thumbnail/preview generation for one stored blob"""
+    __tablename__ = 'rendition_jobs'
+
+    job_id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)
+    source_path = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, done, unsupported, failed
+    renditions = db.Column(db.Text)  # JSON: {size: {format: path under RENDITION_FOLDER}}
+    error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    @classmethod
+    def done_for(cls, content_hash):
+        """Correlated subquery selecting the finished renditions of a hash column"""
+        return (
+            db.select(cls.renditions)
+            .where(cls.content_hash == content_hash, cls.status == 'done')
+            .scalar_subquery()
+        )
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'renditions': rendition_urls(self.renditions),
+            'error': self.error
+        }
+
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_property_id_type_active', 'property_id', 'notification_type', 'is_active'),
+    )
     
     notification_id = db.Column(db.Integer, primary_key=True)
     property_id = db.Column(db.String(20), db.ForeignKey('properties.property_id'))
@@ -242,28 +547,829 @@ class Notification(db.Model):
         }
 
 class Dashboard(db.Model):
-    __tablename__ = 'dashboard'
+    """Materialized per-user portfolio summary, kept current by the write paths"""
+    __tablename__ = 'portfolio_summary'
+
+    SUMMARY_FIELDS = (
+        'total_properties', 'occupied_properties', 'vacant_properties',
+        'total_tenants', 'total_income', 'total_pending', 'total_expected'
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    total_properties = db.Column(db.Integer, nullable=False)
-    total_tenants = db.Column(db.Integer, nullable=False)
-    total_income = db.Column(db.Float, nullable=False)
-    vacant_properties = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), unique=True, nullable=False)
+    total_properties = db.Column(db.Integer, nullable=False, default=0)
+    occupied_properties = db.Column(db.Integer, nullable=False, default=0)
+    vacant_properties = db.Column(db.Integer, nullable=False, default=0)
+    total_tenants = db.Column(db.Integer, nullable=False, default=0)
+    total_income = db.Column(db.Float, nullable=False, default=0)
+    total_pending = db.Column(db.Float, nullable=False, default=0)
+    total_expected = db.Column(db.Float, nullable=False, default=0)
 
     @classmethod
-    def get_dashboard_data(cls):
-        total_properties = Property.query.count()
-        total_tenants = Tenant.query.count()
-        total_income = sum(payment.amount for payment in Payment.query.filter_by(status='paid'))
-        vacant_properties = Property.query.filter_by(occupancy_status='vacant').count()
+    def get_dashboard_data(cls, user_id):
+        """Return the summary row for a user, building it on first access"""
+        summary = cls.query.filter_by(user_id=user_id).first()
+        if summary is None:
+            summary = cls.rebuild(user_id)
+        return summary
 
-        return cls(
-            total_properties=total_properties,
-            total_tenants=total_tenants,
-            total_income=total_income,
-            vacant_properties=vacant_properties
+    @classmethod
+    def rebuild(cls, user_id):
+        """Recompute a user's summary from scratch"""
+        totals = cls.compute_totals(Property.user_id == user_id)
+        summary = cls.query.filter_by(user_id=user_id).first() or cls(user_id=user_id)
+        for field, value in totals.items():
+            setattr(summary, field, value)
+        db.session.add(summary)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request built the row concurrently
+            db.session.rollback()
+            summary = cls.query.filter_by(user_id=user_id).one()
+        return summary
+
+    @classmethod
+    def empty_totals(cls):
+        return dict.fromkeys(cls.SUMMARY_FIELDS, 0)
+
+    @classmethod
+    def property_totals(cls, property_id):
+        """Contribution of a single property to its owner's summary"""
+        return cls.compute_totals(Property.property_id == property_id)
+
+    @classmethod
+    def compute_totals(cls, *criteria):
+        """Aggregate summary figures for the properties matching criteria"""
+        has_occupancy = db.exists().where(Occupancy.property_id == Property.property_id)
+        tenant_count = (
+            db.select(db.func.count(Occupancy.occupancy_id))
+            .where(Occupancy.property_id == Property.property_id)
+            .scalar_subquery()
+        )
+
+        total_properties, occupied, vacant, tenants, expected = db.session.query(
+            db.func.count(Property.property_id),
+            db.func.coalesce(db.func.sum(db.case((Property.occupancy_status == 'occupied', 1), else_=0)), 0),
+            db.func.coalesce(db.func.sum(db.case((Property.occupancy_status == 'vacant', 1), else_=0)), 0),
+            db.func.coalesce(db.func.sum(tenant_count), 0),
+            db.func.coalesce(db.func.sum(db.case((has_occupancy, Property.rent_per_month), else_=0)), 0)
+        ).filter(*criteria).one()
+
+        income, pending = (
+            db.session.query(
+                db.func.coalesce(db.func.sum(db.case((Payment.status == 'paid', Payment.amount), else_=0)), 0),
+                db.func.coalesce(db.func.sum(db.case((Payment.status == 'due', Payment.amount), else_=0)), 0)
+            )
+            .join(Occupancy, Payment.occupancy_id == Occupancy.occupancy_id)
+            .join(Property, Occupancy.property_id == Property.property_id)
+            .filter(*criteria)
+            .one()
+        )
+
+        return {
+            'total_properties': total_properties,
+            'occupied_properties': occupied,
+            'vacant_properties': vacant,
+            'total_tenants': tenants,
+            'total_income': income,
+            'total_pending': pending,
+            'total_expected': expected
+        }
+
+    @classmethod
+    def apply_delta(cls, user_id, before, after):
+        """Shift a user's summary by the difference between two property_totals snapshots.
+
+        Runs inside the caller's transaction; if the user has no summary row yet
+        it is simply built from scratch on the next read.
+        """
+        changes = {
+            getattr(cls, field): getattr(cls, field) + (after[field] - before[field])
+            for field in cls.SUMMARY_FIELDS
+            if after[field] != before[field]
+        }
+        if changes:
+            cls.query.filter_by(user_id=user_id).update(changes, synchronize_session=False)
+
+class DataVersion(db.Model):
+    """Per-user counter bumped by every write; GET views derive their ETags from it"""
+    __tablename__ = 'data_versions'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def current(cls, user_id):
+        return db.session.query(cls.version).filter_by(user_id=user_id).scalar() or 0
+
+    @classmethod
+    def for_request(cls, user_id):
+        """current(), read once per request; shared by the ETags and the response cache keys"""
+        versions = g.setdefault('data_versions', {})
+        if user_id not in versions:
+            versions[user_id] = cls.current(user_id)
+        return versions[user_id]
+
+    @staticmethod
+    def forget_request():
+        """before_request hook: an app context pushed by a test or CLI outlives its requests"""
+        g.pop('data_versions', None)
+
+    @classmethod
+    def bump(cls, user_id):
+        """Increment inside the caller's transaction so it commits with the write"""
+        statement = sqlite_insert(cls).values(user_id=user_id, version=1)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[cls.user_id],
+            set_={'version': cls.version + 1}
+        ))
+
+class IncomeRollup(db.Model):
+    """Monthly income per property: what was scheduled, collected and is still outstanding.
+
+    period is the first day of the due-date month. Rows of a property are
+    rebuilt when its schedule changes and shifted in place when a single
+    payment changes status, so time series never scan the payments table.
+    """
+    __tablename__ = 'income_rollup'
+    __table_args__ = (
+        db.Index('ix_income_rollup_user_id_period', 'user_id', 'period'),
+    )
+
+    property_id = db.Column(db.String(20), db.ForeignKey('properties.property_id'), primary_key=True)
+    period = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    expected = db.Column(db.Float, nullable=False, default=0)
+    collected = db.Column(db.Float, nullable=False, default=0)
+    outstanding = db.Column(db.Float, nullable=False, default=0)
+
+    @classmethod
+    def refresh_property(cls, property_id):
+        """Rebuild the rows of one property inside the caller's transaction"""
+        cls.refresh_properties([property_id])
+
+    @classmethod
+    def refresh_properties(cls, property_ids):
+        cls.query.filter(cls.property_id.in_(property_ids)).delete(synchronize_session=False)
+        period = db.func.date(Payment.due_date, 'start of month')
+        rows = (
+            db.select(
+                Property.user_id,
+                Property.property_id,
+                period,
+                db.func.sum(Payment.amount),
+                db.func.sum(db.case((Payment.status == 'paid', Payment.amount), else_=0)),
+                db.func.sum(db.case((Payment.status == 'due', Payment.amount), else_=0))
+            )
+            .join(Occupancy, Occupancy.property_id == Property.property_id)
+            .join(Payment, Payment.occupancy_id == Occupancy.occupancy_id)
+            .where(Property.property_id.in_(property_ids))
+            .group_by(Property.property_id, period)
+        )
+        db.session.execute(
+            db.insert(cls).from_select(
+                ['user_id', 'property_id', 'period', 'expected', 'collected', 'outstanding'], rows
+            )
+        )
+
+    @classmethod
+    def shift(cls, shifts):
+        """Add {(property_id, period): (collected, outstanding)} to the stored rows"""
+        for (property_id, period), (collected, outstanding) in shifts.items():
+            if collected or outstanding:
+                cls.query.filter_by(property_id=property_id, period=period).update({
+                    cls.collected: cls.collected + collected,
+                    cls.outstanding: cls.outstanding + outstanding
+                }, synchronize_session=False)
+
+    @classmethod
+    def rebuild_all(cls):
+        property_ids = [row[0] for row in db.session.query(Occupancy.property_id).distinct()]
+        for property_id in property_ids:
+            cls.refresh_property(property_id)
+        db.session.commit()
+        return len(property_ids)
+
+MAX_NOTIFICATION_PERIOD = 30
+
+class DueEvent(db.Model):
+    """Precomputed notification triggers.
+
+    One row per due payment or lease end that an active notification
+    preference covers; fire_date is the event date minus the notification
+    period. Rows are rebuilt per property whenever its lease, payments or
+    notification preferences change, so evaluating the rules for a day is a
+    range scan on fire_date.
+    """
+    __tablename__ = 'due_events'
+    __table_args__ = (
+        db.Index('ix_due_events_fire_date', 'fire_date'),
+        db.Index('ix_due_events_user_id_fire_date', 'user_id', 'fire_date'),
+        db.Index('ix_due_events_property_id', 'property_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    property_id = db.Column(db.String(20), db.ForeignKey('properties.property_id'), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)  # 'lease_renewal' or 'payment'
+    ref_id = db.Column(db.Integer, nullable=False)  # occupancy_id or payment_id
+    event_date = db.Column(db.Date, nullable=False)
+    fire_date = db.Column(db.Date, nullable=False)
+    amount = db.Column(db.Float)
+
+    @classmethod
+    def refresh_property(cls, property_id):
+        """Rebuild the events of one property inside the caller's transaction"""
+        cls.query.filter_by(property_id=property_id).delete(synchronize_session=False)
+        rows = cls.build_rows(property_id)
+        if rows:
+            db.session.execute(db.insert(cls), rows)
+        NotificationOutbox.sync_property(property_id, date.today())
+
+    @classmethod
+    def build_rows(cls, property_id):
+        user_id = db.session.query(Property.user_id).filter_by(property_id=property_id).scalar()
+        occupancy = Occupancy.query.filter_by(property_id=property_id).first()
+        if user_id is None or occupancy is None:
+            return []
+
+        periods = dict(
+            db.session.query(Notification.notification_type, Notification.notification_period)
+            .filter_by(property_id=property_id, is_active=True)
+            .all()
+        )
+
+        rows = []
+        if 'lease_renewal' in periods:
+            lease_end_date = as_date(occupancy.lease_end_date)
+            rows.append({
+                'user_id': user_id,
+                'property_id': property_id,
+                'kind': 'lease_renewal',
+                'ref_id': occupancy.occupancy_id,
+                'event_date': lease_end_date,
+                'fire_date': lease_end_date - timedelta(days=periods['lease_renewal']),
+                'amount': None
+            })
+        if 'payment' in periods:
+            due_payments = db.session.query(Payment.payment_id, Payment.amount, Payment.due_date).filter_by(
+                occupancy_id=occupancy.occupancy_id, status='due'
+            )
+            rows.extend({
+                'user_id': user_id,
+                'property_id': property_id,
+                'kind': 'payment',
+                'ref_id': payment_id,
+                'event_date': due_date,
+                'fire_date': due_date - timedelta(days=periods['payment']),
+                'amount': amount
+            } for payment_id, amount, due_date in due_payments)
+        return rows
+
+    @classmethod
+    def rebuild_all(cls):
+        """Backfill the index for every property with an active notification"""
+        property_ids = [
+            row[0] for row in
+            db.session.query(Notification.property_id).filter_by(is_active=True).distinct()
+        ]
+        for property_id in property_ids:
+            cls.refresh_property(property_id)
+        db.session.commit()
+        return len(property_ids)
+
+    @classmethod
+    def firing_for_user(cls, user_id, today):
+        """Events in a notification window today, read live so they never wait for the rule run"""
+        return db.session.execute(
+            cls.firing_on(today)
+            .add_columns(Property.street_name)
+            .join(Property, cls.property_id == Property.property_id)
+            .where(cls.user_id == user_id)
+            .order_by(cls.property_id, cls.event_date)
+        ).all()
+
+    @classmethod
+    def firing_on(cls, today):
+        """Select the events whose notification window contains today"""
+        return db.select(
+            cls.user_id, cls.property_id, cls.kind, cls.ref_id, cls.event_date, cls.amount
+        ).where(
+            cls.fire_date >= today - timedelta(days=MAX_NOTIFICATION_PERIOD),
+            cls.fire_date <= today,
+            cls.event_date >= today
+        )
+
+class NotificationOutbox(db.Model):
+    """Notifications raised by the rule run, waiting for or past delivery.
+
+    A row is unique per event, so re-running the rules for a day is a no-op.
+    Rows whose event goes away (payment settled, lease ended early,
+    preference disabled) are pruned when the property's due events are
+    rebuilt.
+    """
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'ref_id', 'event_date', name='uq_notification_outbox_event'),
+        db.Index('ix_notification_outbox_user_id_event_date', 'user_id', 'event_date'),
+        db.Index('ix_notification_outbox_property_id', 'property_id'),
+        db.Index('ix_notification_outbox_sent_at', 'sent_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    property_id = db.Column(db.String(20), db.ForeignKey('properties.property_id'), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)
+    ref_id = db.Column(db.Integer, nullable=False)
+    event_date = db.Column(db.Date, nullable=False)
+    amount = db.Column(db.Float)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime)
+
+    COLUMNS = ('user_id', 'property_id', 'kind', 'ref_id', 'event_date', 'amount')
+
+    @classmethod
+    def enqueue_due(cls, today, property_id=None):
+        """Raise a row for every due event firing today; returns how many were new"""
+        events = DueEvent.firing_on(today)
+        if property_id is not None:
+            events = events.where(DueEvent.property_id == property_id)
+        statement = sqlite_insert(cls).from_select(cls.COLUMNS, events).on_conflict_do_nothing()
+        owners = db.session.execute(statement.returning(cls.user_id)).scalars().all()
+        for user_id in set(owners):
+            DataVersion.bump(user_id)
+        return len(owners)
+
+    @classmethod
+    def sync_property(cls, property_id, today):
+        """Drop the rows of a property that no longer fire and raise the ones that now do"""
+        still_firing = db.select(DueEvent.id).where(
+            DueEvent.property_id == property_id,
+            DueEvent.kind == cls.kind,
+            DueEvent.ref_id == cls.ref_id,
+            DueEvent.event_date == cls.event_date,
+            DueEvent.fire_date <= today
+        ).exists()
+        cls.query.filter(cls.property_id == property_id, ~still_firing).delete(synchronize_session=False)
+        cls.enqueue_due(today, property_id)
+
+    def message(self, recipient, street_name):
+        """(recipient, subject, body) handed to the delivery sender"""
+        event_date = self.event_date.strftime('%Y-%m-%d')
+        if self.kind == 'lease_renewal':
+            return (recipient, f"Lease renewal: {street_name}",
+                    f"The lease at {street_name} ends on {event_date}.")
+        return (recipient, f"Payment due: {street_name}",
+                f"A payment of {self.amount} for {street_name} is due on {event_date}.")
+
+
+def evaluate_notification_rules(today=None):
+    """Rule run: move every due event whose window opened into the outbox"""
+    raised = NotificationOutbox.enqueue_due(today or date.today())
+    db.session.commit()
+    return raised
+
+def deliver_notifications(sender, batch_size=100, max_attempts=8, retry_delay=60, claim_timeout=600):
+    """Claim the oldest deliverable outbox rows, hand them to the sender and record the outcome of each.
+
+    The claim is one UPDATE ... RETURNING that counts the attempt and hides
+    the rows for claim_timeout seconds, so every worker process can run this
+    loop without two of them sending the same row; rows of a worker that dies
+    mid-send become deliverable again afterwards. Rows the sender did not
+    deliver are retried with exponential backoff and skipped for good after
+    max_attempts, so a refused recipient never holds up the rows behind it.
+    """
+    now = datetime.utcnow()
+    deliverable = (
+        db.select(NotificationOutbox.id)
+        .where(
+            NotificationOutbox.sent_at.is_(None),
+            NotificationOutbox.attempts < max_attempts,
+            db.or_(NotificationOutbox.next_attempt_at.is_(None), NotificationOutbox.next_attempt_at <= now)
+        )
+        .order_by(NotificationOutbox.id)
+        .limit(batch_size)
+    )
+    claimed = db.session.execute(
+        db.update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(deliverable))
+        .values(attempts=NotificationOutbox.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=claim_timeout))
+        .returning(NotificationOutbox.id)
+    ).scalars().all()
+    db.session.commit()
+    if not claimed:
+        return 0
+
+    pending = (
+        db.session.query(NotificationOutbox, User.email, Property.street_name)
+        .join(User, NotificationOutbox.user_id == User.user_id)
+        .join(Property, NotificationOutbox.property_id == Property.property_id)
+        .filter(NotificationOutbox.id.in_(claimed))
+        .order_by(NotificationOutbox.id)
+        .all()
+    )
+    error = None
+    try:
+        delivered = set(sender.send([outbox.message(email, street_name) for outbox, email, street_name in pending]))
+    except Exception as e:
+        delivered, error = set(), e
+
+    sent_at = datetime.utcnow()
+    for position, (outbox, _, _) in enumerate(pending):
+        if position in delivered:
+            outbox.sent_at = sent_at
+            outbox.next_attempt_at = None
+        else:
+            outbox.next_attempt_at = sent_at + timedelta(seconds=retry_delay * 2 ** (outbox.attempts - 1))
+            if outbox.attempts >= max_attempts:
+                current_app.logger.warning("giving up on notification %s after %s attempts", outbox.id, outbox.attempts)
+    db.session.commit()
+    if error is not None:
+        raise error
+    return len(delivered)
+
+def start_notification_workers(app):
+    """Start the rule run and the outbox delivery loop on background threads.
+
+    Every worker process starts both: the rule run is idempotent and delivery
+    claims its rows, so running them side by side sends each message once.
+    """
+    sender = sender_from_config(app.config)
+
+    def in_app_context(job):
+        def run():
+            with app.app_context():
+                try:
+                    job()
+                finally:
+                    db.session.remove()
+        return run
+
+    return [
+        PeriodicWorker('notification-rules', app.config['NOTIFICATION_RULES_INTERVAL'],
+                       in_app_context(evaluate_notification_rules)).start(),
+        PeriodicWorker('notification-delivery', app.config['NOTIFICATION_DELIVERY_INTERVAL'],
+                       in_app_context(lambda: deliver_notifications(
+                           sender, app.config['NOTIFICATION_BATCH_SIZE'],
+                           app.config['NOTIFICATION_MAX_ATTEMPTS'], app.config['NOTIFICATION_RETRY_DELAY'],
+                           app.config['NOTIFICATION_CLAIM_TIMEOUT']
+                       ))).start(),
+    ]
+
+
+# Income analytics
+def load_ledger(*criteria):
+    """Load the matching payments into a columnar ledger grouped by property, in one query"""
+    # NumPy is imported on first use rather than when a worker boots
+    from income_analytics import PaymentLedger
+    rows = (
+        db.session.query(Occupancy.property_id, Payment.amount, Payment.due_date, Payment.status)
+        .join(Occupancy, Payment.occupancy_id == Occupancy.occupancy_id)
+        .join(Property, Occupancy.property_id == Property.property_id)
+        .filter(*criteria)
+        .order_by(Payment.payment_id)
+        .all()
+    )
+    return PaymentLedger.from_rows(rows)
+
+
+# Dashboard aggregation
+def compute_dashboard(user_id, today):
+    """Build the dashboard payload from the portfolio summary and a fixed number of grouped queries"""
+    summary = Dashboard.get_dashboard_data(user_id)
+
+    # Property statistics
+    total_properties = summary.total_properties
+    occupied_properties = summary.occupied_properties
+    vacant_properties = total_properties - occupied_properties
+    occupancy_rate = (occupied_properties / total_properties * 100) if total_properties > 0 else 0
+
+    property_stats = {
+        'total': total_properties,
+        'occupied': occupied_properties,
+        'vacant': vacant_properties,
+        'occupancy_rate': round(occupancy_rate, 1)
+    }
+
+    # Financial statistics
+    total_collected = summary.total_income
+    total_pending = summary.total_pending
+    total_expected = summary.total_expected
+
+    collection_rate = (total_collected / total_expected * 100) if total_expected > 0 else 0
+
+    financial_stats = {
+        'total_collected': total_collected,
+        'total_pending': total_pending,
+        'total_expected': total_expected,
+        'collection_rate': round(collection_rate, 1)
+    }
+
+    # Recent activities: the last 5 payments of each occupancy (1 query)
+    ranked = (
+        db.session.query(
+            Payment.occupancy_id.label('occupancy_id'),
+            Property.street_name.label('street_name'),
+            Occupancy.tenant_name.label('tenant_name'),
+            Payment.amount.label('amount'),
+            Payment.due_date.label('due_date'),
+            Payment.status.label('status'),
+            db.func.row_number().over(
+                partition_by=Payment.occupancy_id,
+                order_by=Payment.due_date.desc()
+            ).label('rank')
+        )
+        .join(Occupancy, Payment.occupancy_id == Occupancy.occupancy_id)
+        .join(Property, Occupancy.property_id == Property.property_id)
+        .filter(Property.user_id == user_id)
+        .subquery()
+    )
+    recent_rows = (
+        db.session.query(ranked)
+        .filter(ranked.c.rank <= 5)
+        .order_by(ranked.c.occupancy_id, ranked.c.rank)
+        .all()
+    )
+    recent_activities = [{
+        'property': row.street_name,
+        'tenant': row.tenant_name,
+        'amount': float(row.amount),
+        'due_date': row.due_date.strftime('%Y-%m-%d'),
+        'status': row.status
+    } for row in recent_rows]
+
+    # Upcoming lease expirations in the next 30 days (1 query)
+    expiring = (
+        db.session.query(Property.street_name, Occupancy.tenant_name, Occupancy.lease_end_date)
+        .join(Occupancy, Occupancy.property_id == Property.property_id)
+        .filter(
+            Property.user_id == user_id,
+            Occupancy.lease_end_date >= today,
+            Occupancy.lease_end_date <= today + timedelta(days=30)
+        )
+        .order_by(Occupancy.lease_end_date)
+        .all()
+    )
+    upcoming_expirations = [{
+        'property': row.street_name,
+        'tenant': row.tenant_name,
+        'expiry_date': row.lease_end_date.strftime('%Y-%m-%d'),
+        'days_remaining': (row.lease_end_date - today).days
+    } for row in expiring]
+
+    # Overdue payments (1 query)
+    overdue = (
+        db.session.query(Property.street_name, Occupancy.tenant_name, Payment.amount, Payment.due_date)
+        .join(Occupancy, Payment.occupancy_id == Occupancy.occupancy_id)
+        .join(Property, Occupancy.property_id == Property.property_id)
+        .filter(
+            Property.user_id == user_id,
+            Payment.status == 'due',
+            Payment.due_date < today
         )
+        .order_by(Payment.due_date)
+        .all()
+    )
+    overdue_payments = [{
+        'property': row.street_name,
+        'tenant': row.tenant_name,
+        'amount': float(row.amount),
+        'due_date': row.due_date.strftime('%Y-%m-%d'),
+        'days_overdue': (today - row.due_date).days
+    } for row in overdue]
+
+    # Property list for notification settings (1 query)
+    properties_list = [{
+        'property_id': row.property_id,
+        'street_name': row.street_name,
+        'city': row.city
+    } for row in db.session.query(
+        Property.property_id, Property.street_name, Property.city
+    ).filter(Property.user_id == user_id).all()]
+
+    return {
+        'property_stats': property_stats,
+        'financial_stats': financial_stats,
+        'recent_activities': recent_activities,
+        'upcoming_expirations': upcoming_expirations,
+        'overdue_payments': overdue_payments,
+        'properties': properties_list  # For notification settings dropdown
+    }
+
+
+# List endpoints: keyset pagination, sparse fieldsets and filters
+MAX_PAGE_SIZE = 500
+
+def keyset_listing(fields, key_field, build_query, serializers=None):
+    """Run a list query with ?fields=, ?after= and ?limit= pushed down into SQL.
+
+    fields maps output names to column expressions and build_query takes the
+    selected, labelled columns and returns a query with joins and filters
+    applied. Returns (items, next_cursor); next_cursor is None on the last page.
+    Raises ValueError for unknown fields or a bad limit.
+    """
+    names = list(fields)
+    requested = request.args.get('fields')
+    if requested:
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    key_column = fields[key_field]
+    columns = [fields[name].label(name) for name in names]
+    if key_field not in names:
+        columns.append(key_column.label(key_field))
+    query = build_query(columns)
+
+    key_type = int if isinstance(key_column.type, db.Integer) else str
+    after = request.args.get('after', type=key_type)
+    limit = request.args.get('limit', type=int)
+    if after is not None or limit is not None:
+        query = query.order_by(key_column)
+    if after is not None:
+        query = query.filter(key_column > after)
+    if limit is not None:
+        if limit <= 0:
+            raise ValueError("limit must be greater than 0")
+        limit = min(limit, MAX_PAGE_SIZE)
+        query = query.limit(limit + 1)
+
+    rows = query.all()
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = getattr(rows[-1], key_field)
+
+    serializers = serializers or {}
+    items = [
+        {name: serializers[name](getattr(row, name)) if name in serializers else getattr(row, name)
+         for name in names}
+        for row in rows
+    ]
+    return items, next_cursor
+
+def listing_response(items, next_cursor):
+    """JSON array response; the cursor for the next page goes in X-Next-Cursor"""
+    response = jsonify(items)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
+
+def range_filters(column, min_arg, max_arg):
+    criteria = []
+    minimum = request.args.get(min_arg, type=float)
+    maximum = request.args.get(max_arg, type=float)
+    if minimum is not None:
+        criteria.append(column >= minimum)
+    if maximum is not None:
+        criteria.append(column <= maximum)
+    return criteria
+
+def property_filters():
+    """Server-side ?city=, ?occupancy_status=, ?min_rent= and ?max_rent= filters"""
+    criteria = range_filters(Property.rent_per_month, 'min_rent', 'max_rent')
+    if request.args.get('city'):
+        criteria.append(Property.city == request.args['city'])
+    if request.args.get('occupancy_status'):
+        criteria.append(Property.occupancy_status == request.args['occupancy_status'])
+    return criteria
+
+PROPERTY_LIST_FIELDS = {
+    'property_id': Property.property_id,
+    'property_type': Property.property_type,
+    'street_name': Property.street_name,
+    'city': Property.city,
+    'size_sqft': Property.size_sqft,
+    'bedrooms': Property.bedrooms,
+    'rent_per_month': Property.rent_per_month,
+    'units': Property.units,
+    'occupancy_status': Property.occupancy_status,
+    'building_details': Property.building_details,
+    # Use default image if no image is provided
+    'image': db.func.coalesce(Property.image, 'default.jpg'),
+    'renditions': RenditionJob.done_for(Property.image_hash)
+}
+
+DOCUMENT_LIST_FIELDS = {
+    'document_id': Document.document_id,
+    'title': Document.title,
+    'upload_date': Document.upload_date,
+    'preview': RenditionJob.done_for(Document.content_hash)
+}
+
+def format_date(value):
+    return value.strftime('%Y-%m-%d')
+
+def rendition_urls(renditions):
+    """Static URLs for a RenditionJob.renditions value; None until the job is done"""
+    if not renditions:
+        return None
+    return {
+        size: {fmt: url_for('static', filename=f'renditions/{path}') for fmt, path in formats.items()}
+        for size, formats in json.loads(renditions).items()
+    }
+
+LIST_SERIALIZERS = {'renditions': rendition_urls, 'preview': rendition_urls, 'upload_date': format_date}
+
+
+# Renditions
+def request_renditions(content_hash, source_path):
+    """Queue thumbnails/previews for a stored blob; call after the upload is committed"""
+    if not current_app.config['RENDITIONS_ENABLED']:
+        return
+    result = db.session.execute(
+        sqlite_insert(RenditionJob)
+        .values(content_hash=content_hash, source_path=source_path, status='queued')
+        .on_conflict_do_nothing(index_elements=['content_hash'])
+    )
+    db.session.commit()
+    if result.rowcount:
+        submit_rendition_job(result.inserted_primary_key[0], content_hash, source_path)
+
+def submit_rendition_job(job_id, content_hash, source_path):
+    app = current_app._get_current_object()
+    rendition_pool.submit(job_id, source_path, app.config['RENDITION_FOLDER'], content_hash,
+                          lambda *outcome: finish_rendition_job(app, *outcome))
+
+def finish_rendition_job(app, job_id, renditions, error):
+    """Pool callback: record the outcome and expire the owners' list ETags"""
+    with app.app_context():
+        try:
+            job = db.session.get(RenditionJob, job_id)
+            if job is None:
+                return
+            if error is None:
+                job.status = 'done'
+                job.renditions = json.dumps(renditions)
+            else:
+                job.status = 'unsupported' if isinstance(error, RenditionUnsupported) else 'failed'
+                job.error = str(error)[:500]
+            job.finished_at = datetime.utcnow()
 
+            if job.status == 'done':
+                owners = db.session.query(Property.user_id).filter(Property.image_hash == job.content_hash).union(
+                    db.session.query(Property.user_id).join(Document).filter(Document.content_hash == job.content_hash)
+                )
+                for (owner_id,) in owners.all():
+                    DataVersion.bump(owner_id)
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+def resume_rendition_jobs():
+    """Resubmit jobs that were still queued when the process last stopped"""
+    for job in RenditionJob.query.filter_by(status='queued').all():
+        submit_rendition_job(job.job_id, job.content_hash, job.source_path)
+
+def release_blob(content_hash):
+    """Delete a stored blob and its renditions once no document or property photo references it.
+
+    Call after the change that dropped the reference is committed.
+    """
+    if (
+        db.session.query(Document.query.filter_by(content_hash=content_hash).exists()).scalar()
+        or db.session.query(Property.query.filter_by(image_hash=content_hash).exists()).scalar()
+    ):
+        return
+    current_app.extensions['document_store'].delete(content_hash)
+    RenditionJob.query.filter_by(content_hash=content_hash).delete()
+    db.session.commit()
+    shutil.rmtree(rendition_dir(current_app.config['RENDITION_FOLDER'], content_hash), ignore_errors=True)
+
+
+# Conditional GET
+def conditional_get(view):
+    """Emit a strong ETag and answer a matching If-None-Match with 304.
+
+    The tag covers the user's data version, the request path and query, and
+    today's date (several payloads count days), so it is computed before the
+    view runs and a 304 skips the query and serialization work entirely.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = session.get('user_id')
+        if request.method != 'GET' or user_id is None:
+            return view(*args, **kwargs)
+
+        version = DataVersion.for_request(user_id)
+        fingerprint = f"{user_id}:{version}:{date.today().isoformat()}:{request.full_path}"
+        etag = hashlib.sha1(fingerprint.encode()).hexdigest()
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+        return response
+    return wrapper
 
 
 # Views
@@ -290,6 +1396,8 @@ class UserView(MethodView):
                 phone_number=data['phone_number']
             )
             return jsonify({'message': 'User created successfully'}), 201
+        except HasherBusy as e:
+            return jsonify({'error': str(e)}), 503
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 400
@@ -304,9 +1412,19 @@ class LoginView(MethodView):
             return jsonify({'error': 'Missing credentials'}), 400
 
         user = User.query.filter_by(email=data['email']).first()
-        if user and user.check_password(data['password']):
-            session['user_id'] = user.user_id
-            return jsonify({'message': 'Login successful'}), 200
+        try:
+            if user and user.check_password(data['password']):
+                if password_hasher.needs_rehash(user.password_hash):
+                    # Hash parameters changed since this one was made: upgrade it while we have the password
+                    user.set_password(data['password'])
+                    db.session.commit()
+                    User.forget_cached(user.user_id)
+                # New session id for the authenticated session (no fixation)
+                session.regenerate()
+                session['user_id'] = user.user_id
+                return jsonify({'message': 'Login successful'}), 200
+        except HasherBusy as e:
+            return jsonify({'error': str(e)}), 503
         return jsonify({'error': 'Invalid credentials'}), 401
 
 class PasswordResetView(AuthenticatedMethodView):
@@ -316,19 +1434,24 @@ class PasswordResetView(AuthenticatedMethodView):
         if not all(k in data for k in ['old_password', 'new_password']):
             return jsonify({'error': 'Missing required fields'}), 400
 
-        user = User.query.get(session['user_id'])
-        if not user.check_password(data['old_password']):
-            return jsonify({'error': 'Invalid old password'}), 400
-
+        user = User.get_cached(session['user_id'])
         try:
+            if not user.check_password(data['old_password']):
+                return jsonify({'error': 'Invalid old password'}), 400
+
             user.set_password(data['new_password'])
             db.session.commit()
+            User.forget_cached(user.user_id)
             return jsonify({'message': 'Password updated successfully'}), 200
+        except HasherBusy as e:
+            return jsonify({'error': str(e)}), 503
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 400
 
 class PropertyView(AuthenticatedMethodView):
+    decorators = [conditional_get]
+
     def post(self):
         """Add a new property"""
         if 'user_id' not in session:
@@ -337,10 +1460,10 @@ class PropertyView(AuthenticatedMethodView):
         data = request.json
 
         # Ensure required fields are present
-        required_fields = ['property_type', 'street_name', 'city', 'size_sqft', 'bedrooms', 'units', 'rent_per_month']
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
-            return jsonify({'error': f"Missing fields: {', '.join(missing_fields)}"}), 400
+        try:
+            self.validate_property_data(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         try:
             # Create the new property with occupancy_status always set to 'vacant'
@@ -359,7 +1482,15 @@ class PropertyView(AuthenticatedMethodView):
             )
 
             db.session.add(new_property)
+            db.session.flush()
+            Dashboard.apply_delta(
+                session['user_id'],
+                Dashboard.empty_totals(),
+                Dashboard.property_totals(new_property.property_id)
+            )
+            DataVersion.bump(session['user_id'])
             db.session.commit()
+            response_cache.invalidate(session['user_id'], 'dashboard', 'overview')
 
             return jsonify({
                 'message': 'Property added successfully',
@@ -376,31 +1507,32 @@ class PropertyView(AuthenticatedMethodView):
 
         # Fetch properties belonging to the logged-in user
         user_id = session['user_id']
-        properties = Property.query.filter_by(user_id=user_id).all()
+        try:
+            properties_data, next_cursor = keyset_listing(
+                PROPERTY_LIST_FIELDS,
+                'property_id',
+                lambda columns: db.session.query(*columns).filter(
+                    Property.user_id == user_id, *property_filters()
+                ),
+                serializers=LIST_SERIALIZERS
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        if not properties:
-            print('properties does not exist')
+        if not properties_data and not request.args:
+            current_app.logger.debug("No properties for user %s", user_id)
             return render_template('properties.html', properties=[])
 
-        # Convert properties to dictionaries
-        properties_data = [
-            {
-                'property_id': p.property_id,
-                'property_type': p.property_type,
-                'street_name': p.street_name,
-                'city': p.city,
-                'size_sqft': p.size_sqft,
-                'bedrooms': p.bedrooms,
-                'rent_per_month': p.rent_per_month,
-                'units': p.units,
-                'occupancy_status': p.occupancy_status,
-                'building_details': p.building_details,
-                # Use default image if no image is provided
-                'image': 'default.jpg'  # Replace this with p.image if image uploads are implemented
-            }
-            for p in properties
-        ]
-        return jsonify(properties_data), 200
+        return listing_response(properties_data, next_cursor), 200
+
+    @staticmethod
+    def validate_property_data(data):
+        """Validate property data"""
+        required_fields = ['property_type', 'street_name', 'city', 'size_sqft', 'bedrooms', 'units', 'rent_per_month']
+        missing_fields = [field for field in required_fields if field not in data]
+        if missing_fields:
+            raise ValueError(f"Missing fields: {', '.join(missing_fields)}")
+        return True
 
 class PropertyDetailView(AuthenticatedMethodView):
     def get(self, property_id):
@@ -447,10 +1579,15 @@ class PropertyDetailView(AuthenticatedMethodView):
 
         data = request.json
         try:
+            before = Dashboard.property_totals(property_id)
             for key, value in data.items():
                 if hasattr(property, key):
                     setattr(property, key, value)
+            db.session.flush()
+            Dashboard.apply_delta(session['user_id'], before, Dashboard.property_totals(property_id))
+            DataVersion.bump(session['user_id'])
             db.session.commit()
+            response_cache.invalidate(session['user_id'], 'dashboard', 'overview', f'property:{property_id}')
             return jsonify({'message': 'Property updated successfully'}), 200
         except Exception as e:
             db.session.rollback()
@@ -470,8 +1607,15 @@ class PropertyDetailView(AuthenticatedMethodView):
             }), 200
 
         try:
+            before = Dashboard.property_totals(property_id)
             db.session.delete(property)
+            db.session.flush()
+            Dashboard.apply_delta(session['user_id'], before, Dashboard.empty_totals())
+            DueEvent.refresh_property(property_id)
+            IncomeRollup.refresh_property(property_id)
+            DataVersion.bump(session['user_id'])
             db.session.commit()
+            response_cache.invalidate(session['user_id'], 'dashboard', 'overview', f'property:{property_id}')
             return jsonify({'message': 'Property deleted successfully'}), 200
         except Exception as e:
             db.session.rollback()
@@ -492,6 +1636,8 @@ class OccupancyView(AuthenticatedMethodView):
             data = request.json
             self.validate_occupancy_data(data)
 
+            before = Dashboard.property_totals(property_id)
+
             # Begin transaction
             db.session.begin_nested()
 
@@ -510,40 +1656,29 @@ class OccupancyView(AuthenticatedMethodView):
                 db.session.flush()  # Get occupancy_id
 
                 # Generate payment schedule
-                payment_amount = data['total_rent'] / data['number_of_payments']
-                start_date = datetime.strptime(data['lease_start_date'], '%Y-%m-%d')
-
-                payment_statuses = data.get('payments', [])
-
-                for i in range(data['number_of_payments']):
-                    due_date = start_date + timedelta(days=(30 * i))
-
-                    payment_status = 'due'
-                    if i < len(payment_statuses):
-                        # Extract just the status string from the payment data
-                        payment_status = payment_statuses[i].get('status', 'due')
-
-                    payment = Payment(
-                        occupancy_id=occupancy.occupancy_id,
-                        amount=payment_amount,
-                        due_date=due_date,
-                        status=payment_status
-                    )
-                    db.session.add(payment)
+                # Extract just the status string from the payment data
+                payment_statuses = [p.get('status', 'due') for p in data.get('payments', [])]
+                schedule = occupancy.generate_payment_schedule(
+                    data['number_of_payments'], payment_statuses, commit=False
+                )
+
                 # Update property status
                 property.occupancy_status = 'occupied'
-                
+                db.session.flush()
+
+                Dashboard.apply_delta(session['user_id'], before, Dashboard.property_totals(property_id))
+
                 # Commit transaction
+                DueEvent.refresh_property(property_id)
+                IncomeRollup.refresh_property(property_id)
+                DataVersion.bump(session['user_id'])
                 db.session.commit()
+                response_cache.invalidate(session['user_id'], 'dashboard', 'overview', f'property:{property_id}')
 
                 return jsonify({
                     'message': 'Occupancy added successfully',
                     'occupancy_id': occupancy.occupancy_id,
-                    'payment_schedule': [{
-                        'due_date': payment.due_date.strftime('%Y-%m-%d'),
-                        'amount': payment.amount,
-                        'status': payment.status
-                    } for payment in occupancy.payments]
+                    'payment_schedule': Payment.schedule_to_dict(schedule)
                 }), 201
 
             except Exception as e:
@@ -571,7 +1706,11 @@ class OccupancyView(AuthenticatedMethodView):
             for key, value in data.items():
                 if hasattr(occupancy, key):
                     setattr(occupancy, key, value)
+            db.session.flush()
+            DueEvent.refresh_property(property_id)
+            DataVersion.bump(session['user_id'])
             db.session.commit()
+            response_cache.invalidate(session['user_id'], 'dashboard', f'property:{property_id}')
             return jsonify({'message': 'Occupancy updated successfully'}), 200
         except Exception as e:
             db.session.rollback()
@@ -588,15 +1727,23 @@ class OccupancyView(AuthenticatedMethodView):
             return jsonify({'error': 'No active occupancy found'}), 404
 
         try:
+            before = Dashboard.property_totals(property_id)
             db.session.delete(property.current_occupancy)
             property.occupancy_status = 'vacant'
+            db.session.flush()
+            Dashboard.apply_delta(session['user_id'], before, Dashboard.property_totals(property_id))
+            DueEvent.refresh_property(property_id)
+            IncomeRollup.refresh_property(property_id)
+            DataVersion.bump(session['user_id'])
             db.session.commit()
+            response_cache.invalidate(session['user_id'], 'dashboard', 'overview', f'property:{property_id}')
             return jsonify({'message': 'Occupancy ended successfully'}), 200
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 400
 
-    def validate_occupancy_data(self, data):
+    @staticmethod
+    def validate_occupancy_data(data):
         """Validate occupancy data"""
         required_fields = [
             'tenant_name', 'tenant_phone', 'tenant_email',
@@ -631,6 +1778,8 @@ class OccupancyView(AuthenticatedMethodView):
       
         
 class DocumentView(AuthenticatedMethodView):
+    decorators = [conditional_get]
+
     def get(self, property_id):
         """Get all documents for a property"""
         property = Property.query.filter_by(
@@ -638,7 +1787,17 @@ class DocumentView(AuthenticatedMethodView):
             user_id=session['user_id']
         ).first_or_404()
 
-        return jsonify([doc.to_dict() for doc in property.documents]), 200
+        try:
+            documents, next_cursor = keyset_listing(
+                DOCUMENT_LIST_FIELDS,
+                'document_id',
+                lambda columns: db.session.query(*columns).filter(Document.property_id == property_id),
+                serializers=LIST_SERIALIZERS
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return listing_response(documents, next_cursor), 200
 
     def post(self, property_id):
         """Upload a new document"""
@@ -647,30 +1806,81 @@ class DocumentView(AuthenticatedMethodView):
             user_id=session['user_id']
         ).first_or_404()
 
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
+        try:
+            fields, filename, blob = receive_document_upload()
+        except UploadError as e:
+            return jsonify({'error': e.message}), e.status_code
 
-        file = request.files['file']
-        if not file or not allowed_file(file.filename):
+        if filename is None:
+            return jsonify({'error': 'No file provided'}), 400
+        if blob is None:
             return jsonify({'error': 'Invalid file'}), 400
 
         try:
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
-
-            document = Document(
-                property_id=property_id,
-                title=request.form.get('title', filename),
-                file_path=file_path
-            )
+            document = Document.from_blob(property_id, fields.get('title'), filename, blob)
             db.session.add(document)
+            DataVersion.bump(session['user_id'])
             db.session.commit()
+            response_cache.invalidate(session['user_id'], f'property:{property_id}')
+            request_renditions(blob.digest, blob.path)
             return jsonify({'message': 'Document uploaded successfully'}), 201
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 400
 
+class PropertyImageView(AuthenticatedMethodView):
+    def get(self, property_id):
+        """Rendition status of the property photo"""
+        property = Property.query.filter_by(
+            property_id=property_id,
+            user_id=session['user_id']
+        ).first_or_404()
+
+        job = None
+        if property.image_hash:
+            job = RenditionJob.query.filter_by(content_hash=property.image_hash).first()
+        if job is None:
+            return jsonify({'status': None, 'renditions': None, 'error': None}), 200
+        return jsonify(job.to_dict()), 200
+
+    def post(self, property_id):
+        """Upload the property photo and queue its renditions"""
+        property = Property.query.filter_by(
+            property_id=property_id,
+            user_id=session['user_id']
+        ).first_or_404()
+
+        try:
+            fields, filename, blob = receive_document_upload()
+        except UploadError as e:
+            return jsonify({'error': e.message}), e.status_code
+
+        if filename is None:
+            return jsonify({'error': 'No file provided'}), 400
+        if blob is None:
+            return jsonify({'error': 'Invalid file'}), 400
+
+        previous_hash = property.image_hash
+        try:
+            property.image_hash = blob.digest
+            DataVersion.bump(session['user_id'])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            release_blob(blob.digest)
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            if previous_hash and previous_hash != blob.digest:
+                release_blob(previous_hash)
+            response_cache.invalidate(session['user_id'], f'property:{property_id}')
+            request_renditions(blob.digest, blob.path)
+            job = RenditionJob.query.filter_by(content_hash=blob.digest).first()
+            return jsonify(job.to_dict() if job else {'status': None}), 202
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+
 class DocumentDetailView(AuthenticatedMethodView):
     def get(self, document_id):
         """Download a document"""
@@ -679,7 +1889,10 @@ class DocumentDetailView(AuthenticatedMethodView):
             Property.user_id == session['user_id']
         ).first_or_404()
         
-        return send_file(document.file_path, as_attachment=True)
+        try:
+            return document.download()
+        except FileNotFoundError:
+            return jsonify({'error': 'File not found'}), 404
 
     def delete(self, document_id):
         """Delete a document"""
@@ -689,16 +1902,19 @@ class DocumentDetailView(AuthenticatedMethodView):
         ).first_or_404()
 
         try:
-            if os.path.exists(document.file_path):
-                os.remove(document.file_path)
             db.session.delete(document)
+            DataVersion.bump(session['user_id'])
             db.session.commit()
+            document.release_file()
+            response_cache.invalidate(session['user_id'], f'property:{document.property_id}')
             return jsonify({'message': 'Document deleted successfully'}), 200
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 400
 
 class IncomeView(AuthenticatedMethodView):
+    decorators = [response_cache.cached('property:{property_id}'), conditional_get]
+
     def get(self, property_id):
         """Track income for a property"""
         property = Property.query.filter_by(
@@ -708,18 +1924,136 @@ class IncomeView(AuthenticatedMethodView):
         
         return jsonify(property.get_income_summary()), 200
 
-class NotificationView(AuthenticatedMethodView):
-    def post(self, property_id):
-        """Set notification preferences"""
-        property = Property.query.filter_by(
-            property_id=property_id,
-            user_id=session['user_id']
-        ).first_or_404()
+class PortfolioIncomeView(AuthenticatedMethodView):
+    decorators = [response_cache.cached('dashboard'), conditional_get]
 
-        data = request.json
-        if not all(k in data for k in ['notification_type', 'notification_period']):
-            return jsonify({'error': 'Missing required fields'}), 400
-            
+    def get(self):
+        """Income across all properties of the user"""
+        from income_analytics import analyze, totals_by_group
+        user_id = session['user_id']
+        ledger = load_ledger(Property.user_id == user_id)
+        income = analyze(ledger)
+
+        rents = dict(
+            db.session.query(Occupancy.property_id, Occupancy.total_rent)
+            .join(Property, Occupancy.property_id == Property.property_id)
+            .filter(Property.user_id == user_id)
+            .all()
+        )
+        total_rent = float(sum(rents.values()))
+
+        properties = []
+        for property_id, totals in totals_by_group(ledger).items():
+            rent = float(rents.get(property_id, 0))
+            totals['property_id'] = property_id
+            totals['total_rent'] = rent
+            totals['payment_percentage'] = (totals['total_paid'] / rent * 100) if rent else 0
+            properties.append(totals)
+
+        income.pop('overdue_payments')
+        income.update(
+            total_rent=total_rent,
+            payment_percentage=(income['total_paid'] / total_rent * 100) if total_rent else 0,
+            properties=properties
+        )
+        return jsonify(income), 200
+
+class IncomeTimeseriesView(AuthenticatedMethodView):
+    decorators = [response_cache.cached('dashboard'), conditional_get]
+
+    @staticmethod
+    def parse_period(value):
+        """'YYYY-MM' or 'YYYY-MM-DD' to the first day of that month"""
+        if not value:
+            return None
+        return datetime.strptime(value[:7], '%Y-%m').date()
+
+    @staticmethod
+    def period_label(period, granularity):
+        if granularity == 'quarter':
+            return f"{period.year}-Q{(period.month - 1) // 3 + 1}"
+        return period.strftime('%Y-%m')
+
+    def get(self):
+        """Portfolio income per month or quarter, read from the income rollup"""
+        granularity = request.args.get('granularity', 'month')
+        if granularity not in ('month', 'quarter'):
+            return jsonify({'error': 'Invalid granularity, expected month or quarter'}), 400
+        try:
+            start = self.parse_period(request.args.get('from'))
+            end = self.parse_period(request.args.get('to'))
+        except ValueError as e:
+            return jsonify({'error': f"Invalid period: {str(e)}"}), 400
+
+        criteria = [IncomeRollup.user_id == session['user_id']]
+        if start:
+            criteria.append(IncomeRollup.period >= start)
+        if end:
+            criteria.append(IncomeRollup.period <= end)
+        if request.args.get('property_id'):
+            criteria.append(IncomeRollup.property_id == request.args['property_id'])
+
+        rows = (
+            db.session.query(
+                IncomeRollup.period,
+                db.func.sum(IncomeRollup.expected),
+                db.func.sum(IncomeRollup.collected),
+                db.func.sum(IncomeRollup.outstanding)
+            )
+            .filter(*criteria)
+            .group_by(IncomeRollup.period)
+            .order_by(IncomeRollup.period)
+            .all()
+        )
+
+        # Everything outstanding in a past month is overdue; the current month
+        # only up to yesterday, which needs that month's payments
+        today = date.today()
+        month_start = today.replace(day=1)
+        current_overdue = 0
+        if any(period == month_start for period, _, _, _ in rows):
+            current_overdue = (
+                db.session.query(db.func.coalesce(db.func.sum(Payment.amount), 0))
+                .join(Occupancy, Payment.occupancy_id == Occupancy.occupancy_id)
+                .join(Property, Occupancy.property_id == Property.property_id)
+                .filter(
+                    Property.user_id == session['user_id'],
+                    Payment.status == 'due',
+                    Payment.due_date >= month_start,
+                    Payment.due_date < today,
+                    *([Property.property_id == request.args['property_id']] if request.args.get('property_id') else [])
+                )
+                .scalar()
+            )
+
+        series = {}
+        for period, expected, collected, outstanding in rows:
+            label = self.period_label(period, granularity)
+            point = series.setdefault(label, {
+                'period': label, 'expected': 0.0, 'collected': 0.0, 'outstanding': 0.0, 'overdue': 0.0
+            })
+            point['expected'] += expected
+            point['collected'] += collected
+            point['outstanding'] += outstanding
+            if period < month_start:
+                point['overdue'] += outstanding
+            elif period == month_start:
+                point['overdue'] += current_overdue
+
+        return jsonify({'granularity': granularity, 'series': list(series.values())}), 200
+
+class NotificationView(AuthenticatedMethodView):
+    def post(self, property_id):
+        """Set notification preferences"""
+        property = Property.query.filter_by(
+            property_id=property_id,
+            user_id=session['user_id']
+        ).first_or_404()
+
+        data = request.json
+        if not all(k in data for k in ['notification_type', 'notification_period']):
+            return jsonify({'error': 'Missing required fields'}), 400
+            
         if data['notification_period'] not in [7, 15, 30]:
             return jsonify({'error': 'Invalid notification period'}), 400
             
@@ -743,6 +2077,9 @@ class NotificationView(AuthenticatedMethodView):
                 )
                 db.session.add(notification)
                 
+            db.session.flush()
+            DueEvent.refresh_property(property_id)
+            DataVersion.bump(session['user_id'])
             db.session.commit()
             return jsonify({'message': 'Notification preferences saved'}), 201
         except Exception as e:
@@ -781,6 +2118,9 @@ class NotificationView(AuthenticatedMethodView):
             ).first_or_404()
             
             notification.is_active = False
+            db.session.flush()
+            DueEvent.refresh_property(property_id)
+            DataVersion.bump(session['user_id'])
             db.session.commit()
             return jsonify({'message': 'Notification disabled successfully'}), 200
         except Exception as e:
@@ -788,50 +2128,32 @@ class NotificationView(AuthenticatedMethodView):
             return jsonify({'error': str(e)}), 400
 
 class NotificationCheckView(AuthenticatedMethodView):
+    decorators = [conditional_get]
+
     def get(self):
         """Check all active notifications"""
         current_date = datetime.now().date()
-        
-        notifications = (
-            Notification.query
-            .join(Property)
-            .filter(
-                Property.user_id == session['user_id'],
-                Notification.is_active == True
-            )
-            .all()
-        )
 
         lease_notifications = []
         payment_notifications = []
 
-        for notification in notifications:
-            property = notification.property
-            if not property.current_occupancy:
-                continue
-
-            if notification.notification_type == 'lease_renewal':
-                days_until_end = (property.current_occupancy.lease_end_date - current_date).days
-                if 0 <= days_until_end <= notification.notification_period:
-                    lease_notifications.append({
-                        'property_id': property.property_id,
-                        'street_name': property.street_name,
-                        'lease_end_date': property.current_occupancy.lease_end_date.strftime('%Y-%m-%d'),
-                        'days_remaining': days_until_end
-                    })
-
-            elif notification.notification_type == 'payment':
-                for payment in property.current_occupancy.payments:
-                    if payment.status == 'due':
-                        days_until_due = (payment.due_date - current_date).days
-                        if 0 <= days_until_due <= notification.notification_period:
-                            payment_notifications.append({
-                                'property_id': property.property_id,
-                                'street_name': property.street_name,
-                                'amount': payment.amount,
-                                'due_date': payment.due_date.strftime('%Y-%m-%d'),
-                                'days_until_due': days_until_due
-                            })
+        for event in DueEvent.firing_for_user(session['user_id'], current_date):
+            days_until = (event.event_date - current_date).days
+            if event.kind == 'lease_renewal':
+                lease_notifications.append({
+                    'property_id': event.property_id,
+                    'street_name': event.street_name,
+                    'lease_end_date': event.event_date.strftime('%Y-%m-%d'),
+                    'days_remaining': days_until
+                })
+            elif event.kind == 'payment':
+                payment_notifications.append({
+                    'property_id': event.property_id,
+                    'street_name': event.street_name,
+                    'amount': event.amount,
+                    'due_date': event.event_date.strftime('%Y-%m-%d'),
+                    'days_until_due': days_until
+                })
 
         return jsonify({
             'lease_renewals': lease_notifications,
@@ -839,6 +2161,8 @@ class NotificationCheckView(AuthenticatedMethodView):
         }), 200
 
 class DashboardView(AuthenticatedMethodView):
+    decorators = [response_cache.cached('dashboard'), conditional_get]
+
     def get(self):
         """Get dashboard summary"""
         try:
@@ -848,104 +2172,10 @@ class DashboardView(AuthenticatedMethodView):
             user_id = session['user_id']
             today = datetime.now().date()
 
-            # Get all properties for the user
-            properties = Property.query.filter_by(user_id=user_id).all()
-            
-            # Property Statistics
-            total_properties = len(properties)
-            occupied_properties = sum(1 for p in properties if p.occupancy_status == 'occupied')
-            vacant_properties = total_properties - occupied_properties
-            occupancy_rate = (occupied_properties / total_properties * 100) if total_properties > 0 else 0
-
-            property_stats = {
-                'total': total_properties,
-                'occupied': occupied_properties,
-                'vacant': vacant_properties,
-                'occupancy_rate': round(occupancy_rate, 1)
-            }
-
-            # Financial Statistics
-            total_collected = 0
-            total_pending = 0
-            total_expected = 0
-
-            for property in properties:
-                if property.current_occupancy:
-                    total_expected += property.rent_per_month
-                    for payment in property.current_occupancy.payments:
-                        if payment.status == 'paid':
-                            total_collected += payment.amount
-                        elif payment.status == 'due':
-                            total_pending += payment.amount
-
-            collection_rate = (total_collected / total_expected * 100) if total_expected > 0 else 0
-            
-            financial_stats = {
-                'total_collected': total_collected,
-                'total_pending': total_pending,
-                'total_expected': total_expected,
-                'collection_rate': round(collection_rate, 1)
-            }
-
-            # Recent Activities (last 5 payments)
-            recent_activities = []
-            for property in properties:
-                if property.current_occupancy:
-                    for payment in sorted(property.current_occupancy.payments, 
-                                       key=lambda x: x.due_date, reverse=True)[:5]:
-                        recent_activities.append({
-                            'property': property.street_name,
-                            'tenant': property.current_occupancy.tenant_name,
-                            'amount': float(payment.amount),
-                            'due_date': payment.due_date.strftime('%Y-%m-%d'),
-                            'status': payment.status
-                        })
-
-            # Upcoming Lease Expirations (next 30 days)
-            upcoming_expirations = []
-            for property in properties:
-                if property.current_occupancy:
-                    days_until_expiry = (property.current_occupancy.lease_end_date - today).days
-                    if 0 <= days_until_expiry <= 30:
-                        upcoming_expirations.append({
-                            'property': property.street_name,
-                            'tenant': property.current_occupancy.tenant_name,
-                            'expiry_date': property.current_occupancy.lease_end_date.strftime('%Y-%m-%d'),
-                            'days_remaining': days_until_expiry
-                        })
-
-            # Overdue Payments
-            overdue_payments = []
-            for property in properties:
-                if property.current_occupancy:
-                    for payment in property.current_occupancy.payments:
-                        if payment.status == 'due' and payment.due_date < today:
-                            overdue_payments.append({
-                                'property': property.street_name,
-                                'tenant': property.current_occupancy.tenant_name,
-                                'amount': float(payment.amount),
-                                'due_date': payment.due_date.strftime('%Y-%m-%d'),
-                                'days_overdue': (today - payment.due_date).days
-                            })
-
-            # Get all properties for notification settings
-            properties_list = [{
-                'property_id': p.property_id,
-                'street_name': p.street_name,
-                'city': p.city
-            } for p in properties]
-
-            return jsonify({
-                'property_stats': property_stats,
-                'financial_stats': financial_stats,
-                'recent_activities': recent_activities,
-                'upcoming_expirations': upcoming_expirations,
-                'overdue_payments': overdue_payments,
-                'properties': properties_list  # For notification settings dropdown
-            }), 200
+            return jsonify(compute_dashboard(user_id, today)), 200
 
         except Exception as e:
-            print(f"Dashboard Error: {str(e)}")  # For debugging
+            current_app.logger.exception("Dashboard error")
             return jsonify({'error': 'Failed to load dashboard data'}), 500
 
 class PropertySummaryView(AuthenticatedMethodView):
@@ -973,21 +2203,18 @@ class PropertySummaryView(AuthenticatedMethodView):
         }), 200
 
 class PropertyOverviewView(AuthenticatedMethodView):
+    decorators = [response_cache.cached('overview')]
+
     def get(self):
         """Get properties overview statistics for the logged-in user"""
         if 'user_id' not in session:
             return jsonify({'error': 'User not logged in'}), 401
 
-        user_id = session['user_id']
-        
-        # Total properties
-        total_properties = Property.query.filter_by(user_id=user_id).count()
-
-        # Occupied properties
-        occupied_properties = Property.query.filter_by(user_id=user_id, occupancy_status='occupied').count()
+        summary = Dashboard.get_dashboard_data(session['user_id'])
 
-        # Vacant properties
-        vacant_properties = Property.query.filter_by(user_id=user_id, occupancy_status='vacant').count()
+        total_properties = summary.total_properties
+        occupied_properties = summary.occupied_properties
+        vacant_properties = summary.vacant_properties
         
         # Occupancy rate
         Occupancy_rate = (occupied_properties / total_properties * 100) if total_properties > 0 else 0
@@ -1008,25 +2235,26 @@ class VacantPropertiesView(AuthenticatedMethodView):
         if 'user_id' not in session:
             return jsonify({'error': 'User not logged in'}), 401
 
+        vacant_fields = {
+            name: column for name, column in PROPERTY_LIST_FIELDS.items()
+            if name not in ('occupancy_status', 'building_details')
+        }
+
         try:
-            vacant_properties = Property.query.filter_by(
-                user_id=session['user_id'],
-                occupancy_status='vacant'
-            ).all()
-
-            properties_data = [{
-                'property_id': p.property_id,
-                'property_type': p.property_type,
-                'street_name': p.street_name,
-                'city': p.city,
-                'size_sqft': p.size_sqft,
-                'bedrooms': p.bedrooms,
-                'rent_per_month': p.rent_per_month,
-                'units': p.units,
-                'image': p.image or 'default.jpg'
-            } for p in vacant_properties]
-
-            return jsonify(properties_data), 200
+            properties_data, next_cursor = keyset_listing(
+                vacant_fields,
+                'property_id',
+                lambda columns: db.session.query(*columns).filter(
+                    Property.user_id == session['user_id'],
+                    Property.occupancy_status == 'vacant',
+                    *property_filters()
+                ),
+                serializers=LIST_SERIALIZERS
+            )
+
+            return listing_response(properties_data, next_cursor), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -1060,8 +2288,8 @@ class OccupantsOverviewView(AuthenticatedMethodView):
                 else:
                     active_occupants += 1
 
-            print(f"Debug - Total: {total_occupants}, Active: {active_occupants}, "
-                  f"Pending: {pending_occupants}, Inactive: {inactive_occupants}")  # Debug print
+            current_app.logger.debug("Occupants - Total: %s, Active: %s, Pending: %s, Inactive: %s",
+                                     total_occupants, active_occupants, pending_occupants, inactive_occupants)
 
             return jsonify({
                 'total_occupants': total_occupants,
@@ -1071,7 +2299,7 @@ class OccupantsOverviewView(AuthenticatedMethodView):
             }), 200
 
         except Exception as e:
-            print("Error in occupants overview:", str(e))
+            current_app.logger.exception("Error in occupants overview")
             return jsonify({'error': str(e)}), 500
           
 class OccupantPaymentsView(AuthenticatedMethodView):
@@ -1104,613 +2332,1135 @@ class OccupantPaymentsView(AuthenticatedMethodView):
             occupancy_id=occupancy_id
         ).first_or_404()
 
-        if new_status not in ['due', 'paid']:
+        if new_status not in Payment.STATUSES:
             return jsonify({'error': 'Invalid status'}), 400
 
-        payment.status = new_status
+        outcome, _ = Payment.update_statuses(session['user_id'], {payment.payment_id: new_status})
+        if outcome[payment.payment_id] == 'not_found':
+            return jsonify({'error': 'Payment not found'}), 404
         db.session.commit()
+        response_cache.invalidate(session['user_id'], 'dashboard', f'property:{payment.occupancy.property_id}')
 
         return jsonify({'message': 'Payment status updated successfully'}), 200
 
-def register_routes(app):
-    """Register all routes with the Flask app"""
-    @app.route('/api/signup')
-    def signup_page3():
-        return render_template('/signup.html')
-    
-    @app.route('/signup.html')
-    def signup_page():
-        return render_template('/signup.html')
-    
-    @app.route('/signup')
-    def signup_page2():
-        return render_template('/signup.html')
-
-    @app.route('/login.html')
-    def login_page():
-        return render_template('/login.html')
-    
-    @app.route('/login')
-    def login_page2():
-        return render_template('/login.html')
-    
-    @app.route('/')
-    def home():
-        return render_template('/landing.html')
-    
-    @app.route('/landing.html')
-    def home2():
-        return render_template('/landing.html')
+class PaymentBatchView(AuthenticatedMethodView):
+    MAX_ITEMS = 1000
 
-    # User routes
+    def post(self):
+        """Set the status of many payments, across occupancies, in one transaction"""
+        data = request.get_json(silent=True)
+        items = data.get('updates') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'Expected a non-empty list of updates'}), 400
+        if len(items) > self.MAX_ITEMS:
+            return jsonify({'error': f"At most {self.MAX_ITEMS} updates per batch"}), 400
+
+        results = []
+        changes = {}
+        for item in items:
+            item = item if isinstance(item, dict) else {}
+            payment_id = item.get('payment_id')
+            status = item.get('status')
+            result = {'payment_id': payment_id, 'status': status, 'result': None}
+            if not isinstance(payment_id, int) or isinstance(payment_id, bool):
+                result['result'] = 'invalid_payment_id'
+            elif status not in Payment.STATUSES:
+                result['result'] = 'invalid_status'
+            elif payment_id in changes:
+                result['result'] = 'duplicate'
+            else:
+                changes[payment_id] = status
+            results.append(result)
 
-    app.add_url_rule('/login', view_func=LoginView.as_view('login'))
-    app.add_url_rule('/api/signup', view_func=UserView.as_view('user'))
-    
-# ///////////////////////////////////////////////////////////
-    @app.route('/dashboard.html')
-    def dashboard():
-            return render_template('dashboard.html')
-    
-    @app.route('/dashboard')
-    def dashboard2():
-            return render_template('dashboard.html')
+        properties = set()
+        if changes:
+            try:
+                outcome, properties = Payment.update_statuses(session['user_id'], changes)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                return jsonify({'error': f"Failed to update payments: {str(e)}"}), 500
+            for result in results:
+                if result['result'] is None:
+                    result['result'] = outcome[result['payment_id']]
+
+        if properties:
+            response_cache.invalidate(
+                session['user_id'], 'dashboard', *(f'property:{property_id}' for property_id in properties)
+            )
 
-    app.add_url_rule('/api/dashboard', view_func=DashboardView.as_view('dashboard_api'))
+        return jsonify({
+            'results': results,
+            'updated': sum(1 for result in results if result['result'] == 'updated')
+        }), 200
 
-    
-# ///////////////////////////////////////////////////////////
+class PaymentExportView(AuthenticatedMethodView):
+    EXPORT_COLUMNS = [
+        'payment_id', 'property_id', 'street_name', 'city', 'occupancy_id',
+        'tenant_name', 'amount', 'due_date', 'status'
+    ]
+    BATCH_SIZE = 1000
 
-    # Property routes
-    @app.route('/properties')
-    def properties_page3():
-        return render_template('properties.html')
+    def get(self):
+        """Stream every payment of the user's portfolio as NDJSON or CSV"""
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'error': 'Invalid format, expected ndjson or csv'}), 400
+
+        query = (
+            db.session.query(
+                Payment.payment_id, Property.property_id, Property.street_name, Property.city,
+                Occupancy.occupancy_id, Occupancy.tenant_name, Payment.amount,
+                Payment.due_date, Payment.status
+            )
+            .join(Occupancy, Payment.occupancy_id == Occupancy.occupancy_id)
+            .join(Property, Occupancy.property_id == Property.property_id)
+            .filter(Property.user_id == session['user_id'])
+        )
+        try:
+            if request.args.get('from'):
+                query = query.filter(Payment.due_date >= datetime.strptime(request.args['from'], '%Y-%m-%d').date())
+            if request.args.get('to'):
+                query = query.filter(Payment.due_date <= datetime.strptime(request.args['to'], '%Y-%m-%d').date())
+        except ValueError as e:
+            return jsonify({'error': f"Invalid date format: {str(e)}"}), 400
+        if request.args.get('status'):
+            query = query.filter(Payment.status == request.args['status'])
+
+        # Rows are fetched from the cursor in batches rather than loaded up front.
+        # No ORDER BY: sorting the whole ledger would make SQLite buffer it in a
+        # temp b-tree, while index order already groups rows by property and lease.
+        rows = query.execution_options(yield_per=self.BATCH_SIZE)
+
+        if export_format == 'csv':
+            body, mimetype = self.stream_csv(rows), 'text/csv'
+        else:
+            body, mimetype = self.stream_ndjson(rows), 'application/x-ndjson'
+
+        response = Response(stream_with_context(body), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=payments.{export_format}'
+        return response
+
+    def serialize(self, row):
+        record = dict(zip(self.EXPORT_COLUMNS, row))
+        record['due_date'] = record['due_date'].strftime('%Y-%m-%d')
+        return record
+
+    def stream_ndjson(self, rows):
+        for row in rows:
+            yield json.dumps(self.serialize(row)) + '\n'
+
+    def stream_csv(self, rows):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=self.EXPORT_COLUMNS)
+        writer.writeheader()
+        for count, row in enumerate(rows, start=1):
+            writer.writerow(self.serialize(row))
+            if count % self.BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+class MetricsMethodView(AuthenticatedMethodView):
+    """Base class for operator-only statistics, hidden unless METRICS_ENABLED is set"""
 
-    @app.route('/properties.html')
-    def properties_page2():
-        return render_template('properties.html')
-    
-    @app.route('/api/properties/<property_id>', methods=['GET'])
-    def get_property_details(property_id):
-        property = Property.query.filter_by(property_id=property_id, user_id=session['user_id']).first_or_404()
-        return jsonify({
-            'property_id': property.property_id,
-            'property_type': property.property_type,
-            'street_name': property.street_name,
-            'city': property.city,
-            'building_details': property.building_details,
-            'size_sqft': property.size_sqft,
-            'bedrooms': property.bedrooms,
-            'units': property.units,
-            'rent_per_month': property.rent_per_month,
-            'occupancy_status': property.occupancy_status
-        }), 200
+    def dispatch_request(self, *args, **kwargs):
+        if not current_app.config['METRICS_ENABLED']:
+            return jsonify({'error': 'Not found'}), 404
+        return super().dispatch_request(*args, **kwargs)
 
+class CacheStatsView(MetricsMethodView):
+    def get(self):
+        """Hit/miss counters of the response cache"""
+        return jsonify(response_cache.stats()), 200
 
-    @app.route('/api/properties/<property_id>/full-details', methods=['GET'])
-    def get_property_full_details(property_id):
+class MetricsView(MetricsMethodView):
+    def get(self):
+        """Query counts and timings per endpoint in this worker"""
+        return jsonify(query_profiler.stats()), 200
+
+# Bulk import
+OCCUPANCY_IMPORT_FIELDS = (
+    'tenant_name', 'tenant_phone', 'tenant_email',
+    'lease_start_date', 'lease_end_date', 'total_rent', 'number_of_payments'
+)
+
+def parse_import_row(user_id, row):
+    """Validate one import row like the property and occupancy forms.
+
+    Returns (property row, occupancy row or None, payment statuses); raises
+    ValueError. A row describes a vacant property unless it has tenant columns;
+    paid_installments marks that many leading installments as paid.
+    """
+    if isinstance(row, InvalidRow):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+    PropertyView.validate_property_data(row)
+    property_row = {
+        'property_id': str(uuid.uuid4())[:20],
+        'user_id': user_id,
+        'property_type': row['property_type'],
+        'street_name': row['street_name'],
+        'city': row['city'],
+        'building_details': row.get('building_details'),
+        'size_sqft': float(row['size_sqft']),
+        'bedrooms': int(row['bedrooms']),
+        'units': int(row['units']),
+        'rent_per_month': float(row['rent_per_month']),
+        'occupancy_status': 'vacant',
+        'image': 'default.jpg'
+    }
+    if not any(field in row for field in OCCUPANCY_IMPORT_FIELDS):
+        return property_row, None, ()
+
+    OccupancyView.validate_occupancy_data(row)
+    property_row['occupancy_status'] = 'occupied'
+    occupancy_row = {
+        'property_id': property_row['property_id'],
+        'tenant_name': row['tenant_name'],
+        'tenant_phone': row['tenant_phone'],
+        'tenant_email': row['tenant_email'],
+        'lease_start_date': datetime.strptime(row['lease_start_date'], '%Y-%m-%d').date(),
+        'lease_end_date': datetime.strptime(row['lease_end_date'], '%Y-%m-%d').date(),
+        'total_rent': float(row['total_rent']),
+        'number_of_payments': int(row['number_of_payments'])
+    }
+    statuses = ['paid'] * int(row.get('paid_installments') or 0)
+    return property_row, occupancy_row, statuses
+
+def write_import_batch(user_id, batch):
+    """Insert a batch of parsed rows with one executemany per table, in the caller's transaction"""
+    property_rows = [property_row for property_row, _, _ in batch]
+    db.session.execute(db.insert(Property), property_rows)
+
+    leases = [(occupancy_row, statuses) for _, occupancy_row, statuses in batch if occupancy_row is not None]
+    if leases:
+        occupancy_ids = db.session.execute(
+            db.insert(Occupancy).returning(Occupancy.occupancy_id, sort_by_parameter_order=True),
+            [{k: v for k, v in row.items() if k != 'number_of_payments'} for row, _ in leases]
+        ).scalars().all()
+        schedule = []
+        for occupancy_id, (row, statuses) in zip(occupancy_ids, leases):
+            # Transient copy, only used to compute the schedule rows
+            occupancy = Occupancy(occupancy_id=occupancy_id, total_rent=row['total_rent'],
+                                  lease_start_date=row['lease_start_date'])
+            schedule.extend(occupancy.build_payment_schedule(row['number_of_payments'], statuses))
+        Payment.bulk_insert(schedule)
+        IncomeRollup.refresh_properties([row['property_id'] for row, _ in leases])
+
+    property_ids = [property_row['property_id'] for property_row in property_rows]
+    Dashboard.apply_delta(user_id, Dashboard.empty_totals(),
+                          Dashboard.compute_totals(Property.property_id.in_(property_ids)))
+    DataVersion.bump(user_id)
+
+def import_portfolio(user_id, rows, batch_size=500):
+    """Import (row number, row) pairs for one owner, committing every batch_size valid rows.
+
+    Invalid rows, and the rows of a batch the database rejects, are reported
+    and skipped; everything else is kept. Returns counts and per-row errors.
+    """
+    report = {'properties': 0, 'occupancies': 0, 'errors': []}
+    batch = []
+
+    def flush():
         try:
-            # Get property with related data
-            property = Property.query.filter_by(
-                property_id=property_id,
-                user_id=session['user_id']
-            ).first_or_404()
+            write_import_batch(user_id, [parsed for _, parsed in batch])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            report['errors'].extend({'row': row_number, 'error': f"Batch failed: {e}"} for row_number, _ in batch)
+        else:
+            report['properties'] += len(batch)
+            report['occupancies'] += sum(1 for _, (_, occupancy_row, _) in batch if occupancy_row is not None)
+        batch.clear()
 
-            # Calculate financial summary
-            total_rent = 0
-            total_paid = 0
-            total_due = 0
-            payment_percentage = 0
-
-            if property.current_occupancy:
-                total_rent = float(property.current_occupancy.total_rent)
-                total_paid = sum(float(p.amount) for p in property.current_occupancy.payments if p.status == 'paid')
-                total_due = sum(float(p.amount) for p in property.current_occupancy.payments if p.status == 'due')
-                payment_percentage = (total_paid / total_rent * 100) if total_rent > 0 else 0
-
-            # Prepare response data
-            response_data = {
-                'property_info': {
-                    'property_id': property.property_id,
-                    'property_type': property.property_type,
-                    'street_name': property.street_name,
-                    'city': property.city,
-                    'building_details': property.building_details,
-                    'size_sqft': property.size_sqft,
-                    'bedrooms': property.bedrooms,
-                    'units': property.units,
-                    'rent_per_month': float(property.rent_per_month),
-                    'occupancy_status': property.occupancy_status
-                },
-                'occupancy': None,
-                'financial_summary': {
-                    'total_rent': total_rent,
-                    'total_paid': total_paid,
-                    'total_due': total_due,
-                    'payment_percentage': payment_percentage
-                },
-                'documents': {
-                    'total_documents': len(property.documents),
-                    'documents_list': [
-                        {
-                            'document_id': doc.document_id,
-                            'title': doc.title,
-                            'upload_date': doc.upload_date.strftime('%Y-%m-%d')
-                        } for doc in property.documents
-                    ]
-                }
-            }
+    try:
+        for row_number, row in rows:
+            try:
+                batch.append((row_number, parse_import_row(user_id, row)))
+            except (ValueError, TypeError) as e:
+                report['errors'].append({'row': row_number, 'error': str(e)})
+            if len(batch) >= batch_size:
+                flush()
+    except ImportFormatError as e:
+        # Rows before the unreadable part are still imported
+        report['errors'].append({'row': None, 'error': str(e)})
+    if batch:
+        flush()
+
+    if report['properties']:
+        response_cache.invalidate(user_id, 'dashboard', 'overview')
+    return report
+
+SEED_PASSWORD = 'seed-password'
+SEED_EMAIL_PATTERN = 'seed-%@example.com'
+
+def seed_database(users, properties, payments_per_lease, seed=0, occupied=0.8, batch_size=500):
+    """Add synthetic owners with `properties` properties each, through the import write path.
+
+    Leased properties also get payment and lease renewal notifications. Every
+    owner logs in with SEED_PASSWORD; returns their emails.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    first = db.session.query(db.func.count(User.user_id)).scalar() + 1
+    password_hash = password_hasher.hash(SEED_PASSWORD)
+    emails = [SEED_EMAIL_PATTERN.replace('%', str(first + i)) for i in range(users)]
+    user_ids = db.session.execute(
+        db.insert(User).returning(User.user_id, sort_by_parameter_order=True),
+        [{'full_name': f"Seed Owner {first + i}", 'email': email, 'password_hash': password_hash,
+          'phone_number': f"05{rng.randint(0, 99999999):08d}"} for i, email in enumerate(emails)]
+    ).scalars().all()
+    db.session.commit()
+
+    for user_id in user_ids:
+        rows = generate_portfolio(rng, user_id, properties, payments_per_lease, today, occupied)
+        while batch := list(islice(rows, batch_size)):
+            write_import_batch(user_id, batch)
+            leased = [property_row['property_id'] for property_row, occupancy_row, _ in batch if occupancy_row]
+            if leased:
+                db.session.execute(db.insert(Notification), [
+                    {'property_id': property_id, 'notification_type': notification_type,
+                     'notification_period': rng.choice((7, 15, 30))}
+                    for property_id in leased for notification_type in ('payment', 'lease_renewal')
+                ])
+                for property_id in leased:
+                    DueEvent.refresh_property(property_id)
+            db.session.commit()
+    return emails
 
-            # Add occupancy information if property is occupied
-            if property.current_occupancy:
-                response_data['occupancy'] = {
-                    'tenant_name': property.current_occupancy.tenant_name,
-                    'tenant_phone': property.current_occupancy.tenant_phone,
-                    'tenant_email': property.current_occupancy.tenant_email,
-                    'lease_start_date': property.current_occupancy.lease_start_date.strftime('%Y-%m-%d'),
-                    'lease_end_date': property.current_occupancy.lease_end_date.strftime('%Y-%m-%d'),
-                    'payments_completed': sum(1 for p in property.current_occupancy.payments if p.status == 'paid')
-                }
+class ImportView(AuthenticatedMethodView):
+    def post(self):
+        """Import properties and leases from a CSV or JSON request body"""
+        import_format = request.args.get('format') or format_for(request.mimetype)
+        if import_format not in IMPORT_FORMATS:
+            return jsonify({'error': f"Send text/csv or application/json, or pass format={'|'.join(IMPORT_FORMATS)}"}), 400
 
-            return jsonify(response_data)
+        report = import_portfolio(session['user_id'], iter_rows(request.stream, import_format),
+                                  current_app.config['IMPORT_BATCH_SIZE'])
+        return jsonify(report), 200
 
-        except Exception as e:
-            print(f"Error fetching property details: {str(e)}")
-            return jsonify({'error': str(e)}), 500
+# Routes
+auth_bp = Blueprint('auth', __name__)
+properties_bp = Blueprint('properties', __name__)
+occupants_bp = Blueprint('occupants', __name__)
+documents_bp = Blueprint('documents', __name__)
+income_bp = Blueprint('income', __name__)
+notifications_bp = Blueprint('notifications', __name__)
 
+@auth_bp.route('/api/signup')
+def signup_page3():
+    return render_template('/signup.html')
 
-    @app.route('/api/documents/<int:document_id>/download', methods=['GET'])
-    def download_document(document_id):
-        """Download a document by its ID."""
-        try:
-            # Fetch the document from the database
-            document = Document.query.get_or_404(document_id)
+@auth_bp.route('/signup.html')
+def signup_page():
+    return render_template('/signup.html')
 
-            # Check if the file exists
-            if not os.path.exists(document.file_path):
-                return jsonify({'error': 'File not found'}), 404
+@auth_bp.route('/signup')
+def signup_page2():
+    return render_template('/signup.html')
 
-            # Serve the file for download
-            return send_file(document.file_path, as_attachment=True)
+@auth_bp.route('/login.html')
+def login_page():
+    return render_template('/login.html')
 
-        except Exception as e:
-            print(f"Error downloading document: {str(e)}")
-            return jsonify({'error': 'Failed to download document'}), 500
-
-    app.add_url_rule('/api/properties', view_func=PropertyView.as_view('properties'))
-    app.add_url_rule(
-        '/api/properties/<property_id>', 
-        view_func=PropertyDetailView.as_view('property_detail'),
-        methods=['GET', 'PUT', 'DELETE']  
-    )
-    app.add_url_rule('/api/properties/overview', view_func=PropertyOverviewView.as_view('properties_overview'))
+@auth_bp.route('/login')
+def login_page2():
+    return render_template('/login.html')
 
-# ///////////////////////////////////////////////////////////
+@auth_bp.route('/')
+def home():
+    return render_template('/landing.html')
 
-    # Occupancy routes
-    @app.route('/occupants')
-    def occupants_page():
-        return render_template('occupants.html')
-    
-    @app.route('/occupants.html')
-    def occupants_page2():
-        return render_template('occupants.html')
+@auth_bp.route('/landing.html')
+def home2():
+    return render_template('/landing.html')
 
-    app.add_url_rule(
-        '/api/properties/vacant',
-        view_func=VacantPropertiesView.as_view('vacant_properties')
-    )
-    app.add_url_rule(
-        '/api/properties/<property_id>/occupancy',
-        view_func=OccupancyView.as_view('occupancy'),
-        methods=['POST', 'PUT', 'DELETE', 'VALIDATE_OCCUPANCY_DATA'] 
-    )
-    app.add_url_rule(
-        '/api/occupants/overview',
-        view_func=OccupantsOverviewView.as_view('occupants_overview')
-    )
-    app.add_url_rule(
-        '/api/occupants/<int:occupancy_id>/payments',
-        view_func=OccupantPaymentsView.as_view('occupant_payments'),
-        methods=['GET', 'PUT'] 
-    )
+# User routes
 
-    @app.route('/api/occupants', methods=['GET'])
-    def get_occupants():
-        try:
-            user_id = session.get('user_id')
-            if not user_id:
-                return jsonify({'error': 'Not authenticated'}), 401
+auth_bp.add_url_rule('/login', view_func=LoginView.as_view('login'))
+auth_bp.add_url_rule('/api/signup', view_func=UserView.as_view('user'))
 
-            # Join with properties to get property information
-            occupancies = (db.session.query(Occupancy, Property)
-                        .join(Property, Occupancy.property_id == Property.property_id)
-                        .filter(Property.user_id == user_id)
-                        .all())
+# ///////////////////////////////////////////////////////////
+@properties_bp.route('/dashboard.html')
+def dashboard():
+        return render_template('dashboard.html')
 
-            today = datetime.now().date()
-            
-            occupants_list = []
-            for occ in occupancies:
-                # Determine status based on dates
-                if occ.Occupancy.lease_start_date > today:
-                    status = 'pending'
-                elif occ.Occupancy.lease_end_date < today:
-                    status = 'inactive'
-                else:
-                    status = 'active'
+@properties_bp.route('/dashboard')
+def dashboard2():
+        return render_template('dashboard.html')
 
-                # Get payment status summary
-                total_payments = len(occ.Occupancy.payments)
-                paid_payments = sum(1 for payment in occ.Occupancy.payments if payment.status == 'paid')
-                
-                occupants_list.append({
-                    'occupancy_id': occ.Occupancy.occupancy_id,
-                    'property_id': occ.Property.property_id,
-                    'property_address': f"{occ.Property.street_name}, {occ.Property.city}",
-                    'tenant_name': occ.Occupancy.tenant_name,
-                    'tenant_phone': occ.Occupancy.tenant_phone,
-                    'tenant_email': occ.Occupancy.tenant_email,
-                    'lease_start_date': occ.Occupancy.lease_start_date.strftime('%Y-%m-%d'),
-                    'lease_end_date': occ.Occupancy.lease_end_date.strftime('%Y-%m-%d'),
-                    'total_rent': float(occ.Occupancy.total_rent),
-                    'status': status,
-                    'payment_summary': f"{paid_payments}/{total_payments} payments completed"
-                })
+properties_bp.add_url_rule('/api/dashboard', view_func=DashboardView.as_view('dashboard_api'))
+properties_bp.add_url_rule('/api/cache/stats', view_func=CacheStatsView.as_view('cache_stats'))
+properties_bp.add_url_rule('/api/_metrics', view_func=MetricsView.as_view('metrics'))
 
-            return jsonify(occupants_list)
-        except Exception as e:
-            print("Error in get_occupants:", str(e))
-            return jsonify({'error': str(e)}), 500
-    
-    @app.route('/api/occupancies/<int:occupancy_id>', methods=['PUT'])
-    def update_occupancy(occupancy_id):
-        try:
-            # Verify user is logged in
-            if 'user_id' not in session:
-                return jsonify({'error': 'Not authenticated'}), 401
 
-            # Get the occupancy record
-            occupancy = Occupancy.query.get_or_404(occupancy_id)
-            
-            # Verify the occupancy belongs to a property owned by the current user
-            property = Property.query.filter_by(
-                property_id=occupancy.property_id,
-                user_id=session['user_id']
-            ).first_or_404()
+# ///////////////////////////////////////////////////////////
 
-            data = request.json
-            print("Received update data:", data)  # Debug log
-
-            # Update occupancy details
-            occupancy.tenant_name = data['tenant_name']
-            occupancy.tenant_phone = data['tenant_phone']
-            occupancy.tenant_email = data['tenant_email']
-            occupancy.lease_start_date = datetime.strptime(data['lease_start_date'], '%Y-%m-%d')
-            occupancy.lease_end_date = datetime.strptime(data['lease_end_date'], '%Y-%m-%d')
-            occupancy.total_rent = float(data['total_rent'])
-
-            # Handle payments update
-            if 'payments' in data:
-                # Delete existing payments
-                Payment.query.filter_by(occupancy_id=occupancy_id).delete()
-                
-                # Create new payments with specified status
-                for payment_data in data['payments']:
-                    payment = Payment(
-                        occupancy_id=occupancy_id,
-                        amount=float(payment_data['amount']),
-                        due_date=datetime.strptime(payment_data['date'], '%Y-%m-%d'),
-                        status=payment_data['status']  
-                    )
-                    db.session.add(payment)
-                    print(f"Adding payment: {payment_data}")  # Debug log
-            else:
-                # If no payments data provided, create new payment schedule
-                payment_amount = occupancy.total_rent / data['number_of_payments']
-                start_date = occupancy.lease_start_date
-                
-                for i in range(data['number_of_payments']):
-                    due_date = start_date + timedelta(days=(30 * i))
-                    payment = Payment(
-                        occupancy_id=occupancy_id,
-                        amount=payment_amount,
-                        due_date=due_date,
-                        status='due'
-                    )
-                    db.session.add(payment)
+# Property routes
+@properties_bp.route('/properties')
+def properties_page3():
+    return render_template('properties.html')
+
+@properties_bp.route('/properties.html')
+def properties_page2():
+    return render_template('properties.html')
+
+@properties_bp.route('/api/properties/<property_id>', methods=['GET'])
+def get_property_details(property_id):
+    property = Property.query.filter_by(property_id=property_id, user_id=session['user_id']).first_or_404()
+    return jsonify({
+        'property_id': property.property_id,
+        'property_type': property.property_type,
+        'street_name': property.street_name,
+        'city': property.city,
+        'building_details': property.building_details,
+        'size_sqft': property.size_sqft,
+        'bedrooms': property.bedrooms,
+        'units': property.units,
+        'rent_per_month': property.rent_per_month,
+        'occupancy_status': property.occupancy_status
+    }), 200
+
+
+@properties_bp.route('/api/properties/<property_id>/full-details', methods=['GET'])
+@response_cache.cached('property:{property_id}')
+def get_property_full_details(property_id):
+    try:
+        # Get property with related data
+        property = Property.query.filter_by(
+            property_id=property_id,
+            user_id=session['user_id']
+        ).first_or_404()
 
-            try:
-                db.session.commit()
-                print("Successfully updated occupancy and payments")  # Debug log
-                return jsonify({'message': 'Occupancy updated successfully'}), 200
-            except Exception as e:
-                db.session.rollback()
-                print(f"Error during commit: {str(e)}")  # Debug log
-                raise e
+        # Calculate financial summary
+        total_rent = 0
+        total_paid = 0
+        total_due = 0
+        payment_percentage = 0
+        payments_completed = 0
 
-        except Exception as e:
-            db.session.rollback()
-            print("Error updating occupancy:", str(e))
-            return jsonify({'error': str(e)}), 500
-    
-    
-    @app.route('/api/occupancies/<int:occupancy_id>', methods=['GET'])
-    def get_occupancy_details(occupancy_id):
-        """Fetch details for a specific occupancy."""
-        try:
-            # Fetch the occupancy and related payments
-            occupancy = Occupancy.query.filter_by(occupancy_id=occupancy_id).first_or_404()
-
-            # Prepare data for the response
-            occupancy_data = {
-                'occupancy_id': occupancy.occupancy_id,
-                'property_id': occupancy.property_id,
-                'tenant_name': occupancy.tenant_name,
-                'tenant_phone': occupancy.tenant_phone,
-                'tenant_email': occupancy.tenant_email,
-                'lease_start_date': occupancy.lease_start_date.strftime('%Y-%m-%d'),
-                'lease_end_date': occupancy.lease_end_date.strftime('%Y-%m-%d'),
-                'total_rent': occupancy.total_rent,
-                'payments': [
+        if property.current_occupancy:
+            from income_analytics import analyze
+            income = analyze(load_ledger(Payment.occupancy_id == property.current_occupancy.occupancy_id))
+            total_rent = float(property.current_occupancy.total_rent)
+            total_paid = income['total_paid']
+            total_due = income['total_due']
+            payment_percentage = (total_paid / total_rent * 100) if total_rent > 0 else 0
+            payments_completed = income['payments_completed']
+
+        # Prepare response data
+        response_data = {
+            'property_info': {
+                'property_id': property.property_id,
+                'property_type': property.property_type,
+                'street_name': property.street_name,
+                'city': property.city,
+                'building_details': property.building_details,
+                'size_sqft': property.size_sqft,
+                'bedrooms': property.bedrooms,
+                'units': property.units,
+                'rent_per_month': float(property.rent_per_month),
+                'occupancy_status': property.occupancy_status
+            },
+            'occupancy': None,
+            'financial_summary': {
+                'total_rent': total_rent,
+                'total_paid': total_paid,
+                'total_due': total_due,
+                'payment_percentage': payment_percentage
+            },
+            'documents': {
+                'total_documents': len(property.documents),
+                'documents_list': [
                     {
-                        'payment_id': payment.payment_id,
-                        'amount': payment.amount,
-                        'due_date': payment.due_date.strftime('%Y-%m-%d'),
-                        'status': payment.status
-                    }
-                    for payment in occupancy.payments
+                        'document_id': doc.document_id,
+                        'title': doc.title,
+                        'upload_date': doc.upload_date.strftime('%Y-%m-%d')
+                    } for doc in property.documents
                 ]
             }
+        }
+
+        # Add occupancy information if property is occupied
+        if property.current_occupancy:
+            response_data['occupancy'] = {
+                'tenant_name': property.current_occupancy.tenant_name,
+                'tenant_phone': property.current_occupancy.tenant_phone,
+                'tenant_email': property.current_occupancy.tenant_email,
+                'lease_start_date': property.current_occupancy.lease_start_date.strftime('%Y-%m-%d'),
+                'lease_end_date': property.current_occupancy.lease_end_date.strftime('%Y-%m-%d'),
+                'payments_completed': payments_completed
+            }
 
-            return jsonify(occupancy_data), 200
+        return jsonify(response_data)
 
-        except Exception as e:
-            print("Error fetching occupancy details:", str(e))
-            return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        current_app.logger.exception("Error fetching property details")
+        return jsonify({'error': str(e)}), 500
 
-    # @app.route('/api/properties/<property_id>/delete_occupancy', methods=['DELETE'])
-    # def delete_property_occupancy(property_id):
-    #     """Delete occupancy information for a specific property."""
-    #     try:
-    #         # Ensure the user is logged in
-    #         if 'user_id' not in session:
-    #             return jsonify({'error': 'User not logged in'}), 401
-
-    #         # Fetch the property and validate its association with the logged-in user
-    #         property = Property.query.filter_by(
-    #             property_id=property_id,
-    #             user_id=session['user_id']
-    #         ).first_or_404()
-
-    #         # Check if the property has active occupancy
-    #         if not property.current_occupancy:
-    #             return jsonify({'error': 'No occupancy information found for this property'}), 404
-
-    #         occupancy = property.current_occupancy
-
-    #         # Check for due payments
-    #         due_payments = [
-    #             {
-    #                 'payment_id': payment.payment_id,
-    #                 'amount': payment.amount,
-    #                 'due_date': payment.due_date.strftime('%Y-%m-%d')
-    #             }
-    #             for payment in occupancy.payments if payment.status == 'due'
-    #         ]
-
-    #         # If there are due payments, warn the user before deletion
-    #         if due_payments:
-    #             return jsonify({
-    #                 'warning': 'There are due payments associated with this occupancy.',
-    #                 'due_payments': due_payments,
-    #                 'requires_confirmation': True
-    #             }), 200
-
-    #         # Delete occupancy and associated payments
-    #         db.session.delete(occupancy)
-    #         property.occupancy_status = 'vacant'
-    #         db.session.commit()
-
-    #         return jsonify({'message': 'Occupancy information deleted successfully'}), 200
-
-    #     except Exception as e:
-    #         db.session.rollback()
-    #         print("Error deleting occupancy:", str(e))
-    #         return jsonify({'error': str(e)}), 500
 
-    
-    @app.route('/api/occupants/<int:occupancy_id>/check-delete', methods=['GET'])
-    def check_delete_occupant(occupancy_id):
-        """Check if occupant can be deleted and return due payments if any"""
+properties_bp.add_url_rule('/api/properties', view_func=PropertyView.as_view('properties'))
+properties_bp.add_url_rule(
+    '/api/properties/<property_id>', 
+    view_func=PropertyDetailView.as_view('property_detail'),
+    methods=['GET', 'PUT', 'DELETE']  
+)
+properties_bp.add_url_rule('/api/properties/overview', view_func=PropertyOverviewView.as_view('properties_overview'))
+properties_bp.add_url_rule('/api/import', view_func=ImportView.as_view('portfolio_import'))
+
+# ///////////////////////////////////////////////////////////
+
+# Occupancy routes
+@occupants_bp.route('/occupants')
+def occupants_page():
+    return render_template('occupants.html')
+
+@occupants_bp.route('/occupants.html')
+def occupants_page2():
+    return render_template('occupants.html')
+
+occupants_bp.add_url_rule(
+    '/api/properties/vacant',
+    view_func=VacantPropertiesView.as_view('vacant_properties')
+)
+occupants_bp.add_url_rule(
+    '/api/properties/<property_id>/occupancy',
+    view_func=OccupancyView.as_view('occupancy'),
+    methods=['POST', 'PUT', 'DELETE', 'VALIDATE_OCCUPANCY_DATA'] 
+)
+occupants_bp.add_url_rule(
+    '/api/occupants/overview',
+    view_func=OccupantsOverviewView.as_view('occupants_overview')
+)
+occupants_bp.add_url_rule(
+    '/api/occupants/<int:occupancy_id>/payments',
+    view_func=OccupantPaymentsView.as_view('occupant_payments'),
+    methods=['GET', 'PUT'] 
+)
+occupants_bp.add_url_rule(
+    '/api/payments/export',
+    view_func=PaymentExportView.as_view('payment_export')
+)
+occupants_bp.add_url_rule(
+    '/api/payments/batch',
+    view_func=PaymentBatchView.as_view('payment_batch')
+)
+
+@occupants_bp.route('/api/occupants', methods=['GET'])
+@conditional_get
+def get_occupants():
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        today = datetime.now().date()
+
+        # Payment counts per occupancy, restricted to this user's leases
+        payment_counts = (
+            db.session.query(
+                Payment.occupancy_id.label('occupancy_id'),
+                db.func.count(Payment.payment_id).label('total_payments'),
+                db.func.sum(db.case((Payment.status == 'paid', 1), else_=0)).label('paid_payments')
+            )
+            .join(Occupancy, Payment.occupancy_id == Occupancy.occupancy_id)
+            .join(Property, Occupancy.property_id == Property.property_id)
+            .filter(Property.user_id == user_id)
+            .group_by(Payment.occupancy_id)
+            .subquery()
+        )
+
+        # Determine status based on dates
+        lease_status = db.case(
+            (Occupancy.lease_start_date > today, 'pending'),
+            (Occupancy.lease_end_date < today, 'inactive'),
+            else_='active'
+        )
+        total_payments = db.func.coalesce(payment_counts.c.total_payments, 0)
+        paid_payments = db.func.coalesce(payment_counts.c.paid_payments, 0)
+
+        occupant_fields = {
+            'occupancy_id': Occupancy.occupancy_id,
+            'property_id': Property.property_id,
+            'property_address': Property.street_name + ', ' + Property.city,
+            'tenant_name': Occupancy.tenant_name,
+            'tenant_phone': Occupancy.tenant_phone,
+            'tenant_email': Occupancy.tenant_email,
+            'lease_start_date': Occupancy.lease_start_date,
+            'lease_end_date': Occupancy.lease_end_date,
+            'total_rent': Occupancy.total_rent,
+            'status': lease_status,
+            'payment_summary': (
+                db.cast(paid_payments, db.String) + '/' + db.cast(total_payments, db.String)
+                + ' payments completed'
+            )
+        }
+
+        criteria = range_filters(Occupancy.total_rent, 'min_rent', 'max_rent')
+        if request.args.get('city'):
+            criteria.append(Property.city == request.args['city'])
+        if request.args.get('status'):
+            criteria.append(lease_status == request.args['status'])
+
+        # Join with properties to get property information
         try:
-            # Verify user is logged in
-            if 'user_id' not in session:
-                return jsonify({'error': 'Not authenticated'}), 401
+            occupants_list, next_cursor = keyset_listing(
+                occupant_fields,
+                'occupancy_id',
+                lambda columns: (
+                    db.session.query(*columns)
+                    .select_from(Occupancy)
+                    .join(Property, Occupancy.property_id == Property.property_id)
+                    .outerjoin(payment_counts, payment_counts.c.occupancy_id == Occupancy.occupancy_id)
+                    .filter(Property.user_id == user_id, *criteria)
+                ),
+                serializers={
+                    'lease_start_date': format_date,
+                    'lease_end_date': format_date,
+                    'total_rent': float
+                }
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-            # Get the occupancy record
-            occupancy = Occupancy.query.get_or_404(occupancy_id)
-            
-            # Verify the occupancy belongs to a property owned by the current user
-            property = Property.query.filter_by(
-                property_id=occupancy.property_id,
-                user_id=session['user_id']
-            ).first_or_404()
+        return listing_response(occupants_list, next_cursor)
+    except Exception as e:
+        current_app.logger.exception("Error in get_occupants")
+        return jsonify({'error': str(e)}), 500
 
-            # Check for due payments
-            due_payments = Payment.query.filter_by(
-                occupancy_id=occupancy_id,
-                status='due'
-            ).all()
+@occupants_bp.route('/api/occupancies/<int:occupancy_id>', methods=['PUT'])
+def update_occupancy(occupancy_id):
+    try:
+        # Verify user is logged in
+        if 'user_id' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
 
-            return jsonify({
-                'occupancy_id': occupancy_id,
-                'has_due_payments': len(due_payments) > 0,
-                'due_payments': [{
-                    'payment_id': payment.payment_id,
-                    'amount': float(payment.amount),
-                    'due_date': payment.due_date.strftime('%Y-%m-%d')
-                } for payment in due_payments]
-            })
+        # Get the occupancy record
+        occupancy = Occupancy.query.get_or_404(occupancy_id)
+        
+        # Verify the occupancy belongs to a property owned by the current user
+        property = Property.query.filter_by(
+            property_id=occupancy.property_id,
+            user_id=session['user_id']
+        ).first_or_404()
 
-        except Exception as e:
-            print(f"Error checking occupant deletion: {str(e)}")
-            return jsonify({'error': str(e)}), 500
+        data = request.json
+        current_app.logger.debug("Occupancy update for property %s: %s", property.property_id, sorted(data or ()))
+
+        before = Dashboard.property_totals(property.property_id)
+
+        # Update occupancy details
+        occupancy.tenant_name = data['tenant_name']
+        occupancy.tenant_phone = data['tenant_phone']
+        occupancy.tenant_email = data['tenant_email']
+        occupancy.lease_start_date = datetime.strptime(data['lease_start_date'], '%Y-%m-%d')
+        occupancy.lease_end_date = datetime.strptime(data['lease_end_date'], '%Y-%m-%d')
+        occupancy.total_rent = float(data['total_rent'])
+
+        # Handle payments update
+        if 'payments' in data:
+            # Only write the payments that differ from the stored schedule
+            payments_changed = Payment.reconcile_schedule(occupancy_id, [{
+                'amount': float(payment_data['amount']),
+                'due_date': datetime.strptime(payment_data['date'], '%Y-%m-%d').date(),
+                'status': payment_data['status']
+            } for payment_data in data['payments']])
+        else:
+            # If no payments data provided, create new payment schedule
+            occupancy.generate_payment_schedule(data['number_of_payments'], commit=False)
+            payments_changed = True
 
-    @app.route('/api/occupants/<int:occupancy_id>/delete', methods=['POST'])
-    def delete_occupant(occupancy_id):
-        """Delete an occupant and all related records"""
         try:
-            # Verify user is logged in
-            if 'user_id' not in session:
-                return jsonify({'error': 'Not authenticated'}), 401
+            db.session.flush()
+            Dashboard.apply_delta(session['user_id'], before, Dashboard.property_totals(property.property_id))
+            DueEvent.refresh_property(property.property_id)
+            if payments_changed:
+                IncomeRollup.refresh_property(property.property_id)
+            DataVersion.bump(session['user_id'])
+            db.session.commit()
+            response_cache.invalidate(session['user_id'], 'dashboard', f'property:{property.property_id}')
+            current_app.logger.debug("Updated occupancy and payments of property %s", property.property_id)
+            return jsonify({'message': 'Occupancy updated successfully'}), 200
+        except Exception as e:
+            db.session.rollback()
+            raise e
 
-            # Get the occupancy record
-            occupancy = Occupancy.query.get_or_404(occupancy_id)
-            
-            # Verify the occupancy belongs to a property owned by the current user
-            property = Property.query.filter_by(
-                property_id=occupancy.property_id,
-                user_id=session['user_id']
-            ).first_or_404()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Error updating occupancy")
+        return jsonify({'error': str(e)}), 500
 
-            # Begin transaction
-            db.session.begin_nested()
 
-            try:
-                # Delete all related payments first
-                Payment.query.filter_by(occupancy_id=occupancy_id).delete()
-                
-                # Delete the occupancy
-                db.session.delete(occupancy)
-                
-                # Update property status to vacant
-                property.occupancy_status = 'vacant'
-                
-                # Commit the transaction
-                db.session.commit()
-                
-                print(f"Successfully deleted occupant {occupancy_id} and all related records")
-                return jsonify({'message': 'Occupant and all related records deleted successfully'})
+@occupants_bp.route('/api/occupancies/<int:occupancy_id>', methods=['GET'])
+def get_occupancy_details(occupancy_id):
+    """Fetch details for a specific occupancy."""
+    try:
+        # Fetch the occupancy and related payments
+        occupancy = Occupancy.query.filter_by(occupancy_id=occupancy_id).first_or_404()
+
+        # Prepare data for the response
+        occupancy_data = {
+            'occupancy_id': occupancy.occupancy_id,
+            'property_id': occupancy.property_id,
+            'tenant_name': occupancy.tenant_name,
+            'tenant_phone': occupancy.tenant_phone,
+            'tenant_email': occupancy.tenant_email,
+            'lease_start_date': occupancy.lease_start_date.strftime('%Y-%m-%d'),
+            'lease_end_date': occupancy.lease_end_date.strftime('%Y-%m-%d'),
+            'total_rent': occupancy.total_rent,
+            'payments': [
+                {
+                    'payment_id': payment.payment_id,
+                    'amount': payment.amount,
+                    'due_date': payment.due_date.strftime('%Y-%m-%d'),
+                    'status': payment.status
+                }
+                for payment in occupancy.payments
+            ]
+        }
 
-            except Exception as e:
-                db.session.rollback()
-                raise e
+        return jsonify(occupancy_data), 200
+
+    except Exception as e:
+        current_app.logger.exception("Error fetching occupancy details")
+        return jsonify({'error': str(e)}), 500
+
+# @occupants_bp.route('/api/properties/<property_id>/delete_occupancy', methods=['DELETE'])
+# def delete_property_occupancy(property_id):
+#     """Delete occupancy information for a specific property."""
+#     try:
+#         # Ensure the user is logged in
+#         if 'user_id' not in session:
+#             return jsonify({'error': 'User not logged in'}), 401
+
+#         # Fetch the property and validate its association with the logged-in user
+#         property = Property.query.filter_by(
+#             property_id=property_id,
+#             user_id=session['user_id']
+#         ).first_or_404()
+
+#         # Check if the property has active occupancy
+#         if not property.current_occupancy:
+#             return jsonify({'error': 'No occupancy information found for this property'}), 404
+
+#         occupancy = property.current_occupancy
+
+#         # Check for due payments
+#         due_payments = [
+#             {
+#                 'payment_id': payment.payment_id,
+#                 'amount': payment.amount,
+#                 'due_date': payment.due_date.strftime('%Y-%m-%d')
+#             }
+#             for payment in occupancy.payments if payment.status == 'due'
+#         ]
+
+#         # If there are due payments, warn the user before deletion
+#         if due_payments:
+#             return jsonify({
+#                 'warning': 'There are due payments associated with this occupancy.',
+#                 'due_payments': due_payments,
+#                 'requires_confirmation': True
+#             }), 200
+
+#         # Delete occupancy and associated payments
+#         db.session.delete(occupancy)
+#         property.occupancy_status = 'vacant'
+#         db.session.commit()
+
+#         return jsonify({'message': 'Occupancy information deleted successfully'}), 200
+
+#     except Exception as e:
+#         db.session.rollback()
+#         print("Error deleting occupancy:", str(e))
+#         return jsonify({'error': str(e)}), 500
+
+
+@occupants_bp.route('/api/occupants/<int:occupancy_id>/check-delete', methods=['GET'])
+def check_delete_occupant(occupancy_id):
+    """Check if occupant can be deleted and return due payments if any"""
+    try:
+        # Verify user is logged in
+        if 'user_id' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        # Get the occupancy record
+        occupancy = Occupancy.query.get_or_404(occupancy_id)
+        
+        # Verify the occupancy belongs to a property owned by the current user
+        property = Property.query.filter_by(
+            property_id=occupancy.property_id,
+            user_id=session['user_id']
+        ).first_or_404()
+
+        # Check for due payments
+        due_payments = Payment.query.filter_by(
+            occupancy_id=occupancy_id,
+            status='due'
+        ).all()
+
+        return jsonify({
+            'occupancy_id': occupancy_id,
+            'has_due_payments': len(due_payments) > 0,
+            'due_payments': [{
+                'payment_id': payment.payment_id,
+                'amount': float(payment.amount),
+                'due_date': payment.due_date.strftime('%Y-%m-%d')
+            } for payment in due_payments]
+        })
+
+    except Exception as e:
+        current_app.logger.exception("Error checking occupant deletion")
+        return jsonify({'error': str(e)}), 500
+
+@occupants_bp.route('/api/occupants/<int:occupancy_id>/delete', methods=['POST'])
+def delete_occupant(occupancy_id):
+    """Delete an occupant and all related records"""
+    try:
+        # Verify user is logged in
+        if 'user_id' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        # Get the occupancy record
+        occupancy = Occupancy.query.get_or_404(occupancy_id)
+        
+        # Verify the occupancy belongs to a property owned by the current user
+        property = Property.query.filter_by(
+            property_id=occupancy.property_id,
+            user_id=session['user_id']
+        ).first_or_404()
+
+        # Begin transaction
+        db.session.begin_nested()
+
+        try:
+            before = Dashboard.property_totals(property.property_id)
+
+            # Delete all related payments first
+            Payment.query.filter_by(occupancy_id=occupancy_id).delete()
+            
+            # Delete the occupancy
+            db.session.delete(occupancy)
+            
+            # Update property status to vacant
+            property.occupancy_status = 'vacant'
+            db.session.flush()
+            Dashboard.apply_delta(session['user_id'], before, Dashboard.property_totals(property.property_id))
+            DueEvent.refresh_property(property.property_id)
+            IncomeRollup.refresh_property(property.property_id)
+            
+            # Commit the transaction
+            DataVersion.bump(session['user_id'])
+            db.session.commit()
+            response_cache.invalidate(
+                session['user_id'], 'dashboard', 'overview', f'property:{property.property_id}'
+            )
+            
+            current_app.logger.debug("Deleted occupant %s and all related records", occupancy_id)
+            return jsonify({'message': 'Occupant and all related records deleted successfully'})
 
         except Exception as e:
-            print(f"Error deleting occupant: {str(e)}")
-            return jsonify({'error': str(e)}), 500
+            db.session.rollback()
+            raise e
+
+    except Exception as e:
+        current_app.logger.exception("Error deleting occupant")
+        return jsonify({'error': str(e)}), 500
 
 
 # ///////////////////////////////////////////////////////////
-    
-    
-    
-    # Document routes
-    @app.route('/documents')
-    def documents_page():
-        return render_template('documents.html')
-    
-    @app.route('/documents.html')
-    def documents_page2():
-        return render_template('documents.html')
-
-    @app.route('/api/properties/<property_id>/documents', methods=['POST'])
-    def upload_file(property_id):
-        # Check if the request has a file
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file part in the request'}), 400
-
-        file = request.files['file']
-
-        # Check if a file was selected
-        if file.filename == '':
-            return jsonify({'error': 'No file selected for uploading'}), 400
-
-        # Validate and save the file
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)  # Sanitize the filename
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)  # Save the file to the server
-
-            # Save file metadata to the database
-            new_document = Document(
-                property_id=property_id,  # Get the property ID from the URL
-                title=request.form.get('title', filename),  # Optional title, defaults to filename
-                file_path=file_path
-            )
-            db.session.add(new_document)
-            db.session.commit()
 
-            return jsonify({'message': 'File uploaded successfully', 'file_path': file_path}), 200
 
-        return jsonify({'error': 'Invalid file type'}), 400
-    
-    app.add_url_rule(
-        '/api/properties/<property_id>/documents', 
-        view_func=DocumentView.as_view('documents')
-    )
-    app.add_url_rule(
-        '/api/documents/<document_id>',
-        view_func=DocumentDetailView.as_view('document_detail')
-    )
+
+# Document routes
+@documents_bp.route('/documents')
+def documents_page():
+    return render_template('documents.html')
+
+@documents_bp.route('/documents.html')
+def documents_page2():
+    return render_template('documents.html')
+
+@documents_bp.route('/api/documents/<int:document_id>/download', methods=['GET'])
+def download_document(document_id):
+    """Download a document by its ID."""
+    try:
+        # Fetch the document from the database
+        document = Document.query.get_or_404(document_id)
+
+        # Serve the file for download
+        return document.download()
+
+    except FileNotFoundError:
+        return jsonify({'error': 'File not found'}), 404
+    except Exception as e:
+        current_app.logger.exception("Error downloading document")
+        return jsonify({'error': 'Failed to download document'}), 500
+
+@documents_bp.route('/api/properties/<property_id>/documents', methods=['POST'])
+def upload_file(property_id):
+    # Stream the file part into the document store
+    try:
+        fields, filename, blob = receive_document_upload()
+    except UploadError as e:
+        return jsonify({'error': e.message}), e.status_code
+
+    # Check if the request has a file
+    if filename is None:
+        return jsonify({'error': 'No file part in the request'}), 400
+
+    # Check if a file was selected
+    if filename == '':
+        return jsonify({'error': 'No file selected for uploading'}), 400
+
+    # Save file metadata to the database
+    if blob is not None:
+        new_document = Document.from_blob(property_id, fields.get('title'), filename, blob)
+        db.session.add(new_document)
+        owner_id = db.session.query(Property.user_id).filter_by(property_id=property_id).scalar()
+        DataVersion.bump(owner_id)
+        db.session.commit()
+        response_cache.invalidate(owner_id, f'property:{property_id}')
+        request_renditions(blob.digest, blob.path)
+
+        return jsonify({'message': 'File uploaded successfully', 'file_path': new_document.file_path}), 200
+
+    return jsonify({'error': 'Invalid file type'}), 400
+
+documents_bp.add_url_rule(
+    '/api/properties/<property_id>/documents', 
+    view_func=DocumentView.as_view('documents')
+)
+documents_bp.add_url_rule(
+    '/api/documents/<document_id>',
+    view_func=DocumentDetailView.as_view('document_detail')
+)
+documents_bp.add_url_rule(
+    '/api/properties/<property_id>/image',
+    view_func=PropertyImageView.as_view('property_image')
+)
 # ///////////////////////////////////////////////////////////
-    
-    # Income route
-    @app.route('/income')
-    def income_page():
-        return render_template('income.html')
-    
-    @app.route('/income.html')
-    def income_page2():
-        return render_template('income.html')
-    
-    app.add_url_rule(
-        '/api/properties/<property_id>/income',
-        view_func=IncomeView.as_view('income')
-    )
-    
-    # # Notification routes
-    app.add_url_rule(
-        '/api/properties/<property_id>/notifications',
-        view_func=NotificationView.as_view('notifications'),
-        methods=['GET', 'POST', 'DELETE']
-    )
-    app.add_url_rule(
-        '/api/notifications/check',
-        view_func=NotificationCheckView.as_view('check_notifications')
-    )
-    
-    # # Summary routes
-    # app.add_url_rule(
-    #     '/api/properties/<property_id>/summary',
-    #     view_func=PropertySummaryView.as_view('property_summary')
-    # )
-    # app.add_url_rule(
-    #     '/api/dashboard',
-    #     view_func=DashboardView.as_view('dashboard')
-    # )
+
+# Income route
+@income_bp.route('/income')
+def income_page():
+    return render_template('income.html')
+
+@income_bp.route('/income.html')
+def income_page2():
+    return render_template('income.html')
+
+income_bp.add_url_rule(
+    '/api/properties/<property_id>/income',
+    view_func=IncomeView.as_view('income')
+)
+income_bp.add_url_rule('/api/income', view_func=PortfolioIncomeView.as_view('portfolio_income'))
+income_bp.add_url_rule('/api/income/timeseries', view_func=IncomeTimeseriesView.as_view('income_timeseries'))
+
+# # Notification routes
+notifications_bp.add_url_rule(
+    '/api/properties/<property_id>/notifications',
+    view_func=NotificationView.as_view('notifications'),
+    methods=['GET', 'POST', 'DELETE']
+)
+notifications_bp.add_url_rule(
+    '/api/notifications/check',
+    view_func=NotificationCheckView.as_view('check_notifications')
+)
+
+# # Summary routes
+# properties_bp.add_url_rule(
+#     '/api/properties/<property_id>/summary',
+#     view_func=PropertySummaryView.as_view('property_summary')
+# )
+# properties_bp.add_url_rule(
+#     '/api/dashboard',
+#     view_func=DashboardView.as_view('dashboard')
+# )
+
+BLUEPRINTS = (auth_bp, properties_bp, occupants_bp, documents_bp, income_bp, notifications_bp)
+
+def register_routes(app):
+    """Register all routes with the Flask app"""
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
 
 # Error handlers
-@app.errorhandler(404)
 def not_found_error(error):
     return jsonify({'error': 'Resource not found'}), 404
 
-@app.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return jsonify({'error': 'Internal server error'}), 500
 
 # Initialize the application
-def init_app():
-    if not os.path.exists(app.config['UPLOAD_FOLDER']):
-        os.makedirs(app.config['UPLOAD_FOLDER'])
-    
+def init_db():
+    """Create missing tables and backfill the derived indexes on databases that predate them"""
+    db.create_all()
+    if not db.session.query(DueEvent.query.exists()).scalar():
+        DueEvent.rebuild_all()
+    if not db.session.query(IncomeRollup.query.exists()).scalar():
+        IncomeRollup.rebuild_all()
+
+def init_app(app):
+    """Prepare the database and start this process's background workers; runs once per process"""
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     with app.app_context():
-        db.create_all()
+        init_db()
+        if app.config['RENDITIONS_ENABLED']:
+            resume_rendition_jobs()
+    if app.config['NOTIFICATION_WORKERS']:
+        start_notification_workers(app)
+    if app.config['SESSION_SWEEP_INTERVAL']:
+        PeriodicWorker('session-sweep', app.config['SESSION_SWEEP_INTERVAL'], app.session_interface.sweep).start()
+
+def init_on_first_request(app):
+    """before_request hook running init_app in the first request of each process.
+
+    Threads do not survive fork, so workers must be started in the process
+    that serves; under the debug reloader that is the child only.
+    """
+    lock = threading.Lock()
+    initialized_pid = None
+
+    def ensure_initialized():
+        nonlocal initialized_pid
+        if initialized_pid != os.getpid():
+            with lock:
+                if initialized_pid != os.getpid():
+                    init_app(app)
+                    initialized_pid = os.getpid()
+    return ensure_initialized
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the tables and backfill the derived indexes"""
+    init_db()
+    click.echo("Database initialized")
+
+@click.command('rebuild-due-events')
+@with_appcontext
+def rebuild_due_events():
+    """Rebuild the notification due-event index from scratch"""
+    DueEvent.query.delete()
+    click.echo(f"Rebuilt due events for {DueEvent.rebuild_all()} properties")
+
+@click.command('rebuild-income-rollup')
+@with_appcontext
+def rebuild_income_rollup():
+    """Rebuild the monthly income rollup from the payments table"""
+    IncomeRollup.query.delete()
+    click.echo(f"Rebuilt income rollup for {IncomeRollup.rebuild_all()} properties")
+
+@click.command('import-portfolio')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'email', required=True, help='Email of the owner to import for')
+@click.option('--format', 'import_format', type=click.Choice(IMPORT_FORMATS), help='Defaults to the file extension')
+@with_appcontext
+def import_portfolio_command(path, email, import_format):
+    """Import properties and leases from a CSV or JSON file"""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f"No user with email {email}")
+    import_format = import_format or format_for(filename=path)
+    if import_format is None:
+        raise click.ClickException('Cannot tell the format from the file name, pass --format')
+
+    with open(path, 'rb') as file:
+        report = import_portfolio(user.user_id, iter_rows(file, import_format), current_app.config['IMPORT_BATCH_SIZE'])
+    click.echo(f"Imported {report['properties']} properties and {report['occupancies']} occupancies")
+    for error in report['errors']:
+        click.echo(f"row {error['row']}: {error['error']}", err=True)
+
+@click.command('seed')
+@click.option('--database', 'path', required=True, type=click.Path(dir_okay=False),
+              help='Scratch SQLite file to fill, created if missing')
+@click.option('--users', default=1, show_default=True, help='Owners to create')
+@click.option('--properties', default=100, show_default=True, help='Properties per owner')
+@click.option('--payments-per-lease', default=12, show_default=True, help='Installments per lease')
+@click.option('--occupied', default=0.8, show_default=True, help='Share of properties with a lease')
+@click.option('--seed', default=0, show_default=True, help='Random seed; the same seed gives the same data')
+@with_appcontext
+def seed_command(path, users, properties, payments_per_lease, occupied, seed):
+    """Fill a scratch SQLite file with synthetic owners, properties, leases and payments.
+
+    Every seeded owner shares the public SEED_PASSWORD, so the app's own
+    database, or any file with real accounts in it, is refused.
+    """
+    path = os.path.abspath(path)
+    if db.engine.url.database and os.path.abspath(db.engine.url.database) == path:
+        raise click.ClickException(f"{path} is the application database; seed a scratch file instead")
+
+    seed_app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path,
+                           'NOTIFICATION_WORKERS': False, 'RENDITIONS_ENABLED': False})
+    with seed_app.app_context():
+        init_db()
+        if db.session.query(User.query.filter(~User.email.like(SEED_EMAIL_PATTERN)).exists()).scalar():
+            raise click.ClickException(f"{path} has accounts not created by flask seed; seed a scratch file instead")
+        started = time.perf_counter()
+        emails = seed_database(users, properties, payments_per_lease, seed, occupied,
+                               seed_app.config['IMPORT_BATCH_SIZE'])
+    click.echo(f"Seeded {users * properties} properties for {users} users in {time.perf_counter() - started:.1f}s")
+    click.echo(f"Log in as {emails[0]} / {SEED_PASSWORD}" if emails else "No users created")
+
+def create_app(config=None):
+    """Build the app: configuration, extensions, blueprints and CLI commands.
+
+    Nothing here connects to the database or starts a thread, so a pre-fork
+    server (gunicorn --preload app:app) imports it once in the master and the
+    workers share those pages copy-on-write. Tables, backfills and background
+    workers are set up by init_app on each process's first request, or ahead
+    of time with `flask init-db`.
+    """
+    app = Flask(__name__, template_folder='Templates')
+    app.config.from_object(Config)
+    app.config['RENDITION_FOLDER'] = os.path.join(app.static_folder, 'renditions')
+    app.config.update(config or {})
+    if not app.config['SECRET_KEY']:
+        os.makedirs(app.instance_path, exist_ok=True)
+        app.config['SECRET_KEY'] = load_secret_key(os.path.join(app.instance_path, 'secret_key'))
+    app.session_interface = session_interface_from_config(app.config, app.instance_path)
+    CORS(app)
+
+    db.init_app(app)
+    # Alembic is only needed by the `flask db` commands; WSGI servers load the
+    # app outside any click context and never pay for importing it
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    response_cache.backend = backend_from_config(app.config)
+    response_cache.default_ttl = app.config['RESPONSE_CACHE_TTL']
+    response_cache.data_version = DataVersion.for_request
+    app.extensions['document_store'] = BlobStore(app.config['UPLOAD_FOLDER'], max_size=app.config['DOCUMENT_MAX_SIZE'],
+                                                 chunk_size=app.config['DOCUMENT_CHUNK_SIZE'])
+    rendition_pool.max_workers = app.config['RENDITION_WORKERS']
+    password_hasher.configure(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_WORKERS'],
+                              app.config['PASSWORD_HASH_MAX_PENDING'])
 
-if __name__ == '__main__':
-    init_app()
     register_routes(app)
-    app.run(debug=True)
+    app.register_error_handler(404, not_found_error)
+    app.register_error_handler(500, internal_error)
+    app.before_request(init_on_first_request(app))
+    app.before_request(DataVersion.forget_request)
+    if app.config['PROFILER_ENABLED']:
+        query_profiler.n_plus_one_threshold = app.config['PROFILER_N_PLUS_ONE_THRESHOLD']
+        query_profiler.slow_query_ms = app.config['PROFILER_SLOW_QUERY_MS']
+        query_profiler.server_timing = app.config['PROFILER_SERVER_TIMING']
+        with app.app_context():
+            query_profiler.init_app(app, db.engines.values())
+    for command in (init_db_command, rebuild_due_events, rebuild_income_rollup, import_portfolio_command,
+                    seed_command):
+        app.cli.add_command(command)
+    return app
+
+app = create_app()
 
+if __name__ == '__main__':
+    app.run(debug=True)
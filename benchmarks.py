@@ -0,0 +1,397 @@
+"""Benchmarks and performance checks for the hot paths in app.py
+
+Run with ``python benchmarks.py [name ...]``. Every benchmark runs against a
+scratch SQLite file in a temporary directory, never against
+instance/property_management.db. The process exits non-zero if a check fails.
+"""
+import os
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app import (db, compute_dashboard, create_app, response_cache, seed_database, SEED_PASSWORD,
+                 User, Property, Occupancy, Payment)
+
+
+def scratch_config(workdir, **config):
+    return dict(
+        SECRET_KEY='benchmark',
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'bench.db'),
+        UPLOAD_FOLDER=os.path.join(workdir, 'documents'),
+        RENDITION_FOLDER=os.path.join(workdir, 'renditions'),
+        SESSION_SQLITE_PATH=os.path.join(workdir, 'sessions.db'),
+        NOTIFICATION_WORKERS=False,
+        RENDITIONS_ENABLED=False,
+        TESTING=True,
+        **config
+    )
+
+
+def scratch_app(**config):
+    """Build the app on a throwaway SQLite database and push its context"""
+    bench_app = create_app(scratch_config(tempfile.mkdtemp(prefix='propmanager-bench-'), **config))
+    bench_app.app_context().push()
+    db.create_all()
+    return bench_app
+
+
+def seed_occupancy(total_rent=12000, user=None):
+    if user is None:
+        user = User(full_name='Bench User', email=f'bench-{time.time_ns()}@example.com',
+                    password_hash='x', phone_number='0')
+        db.session.add(user)
+        db.session.flush()
+    property = Property(user_id=user.user_id, property_type='apartment', street_name='Bench St',
+                        city='Dubai', size_sqft=1000, bedrooms=2, units=1, rent_per_month=1000,
+                        occupancy_status='occupied')
+    db.session.add(property)
+    db.session.flush()
+    occupancy = Occupancy(property_id=property.property_id, tenant_name='Tenant',
+                          lease_start_date=date(2025, 1, 1), lease_end_date=date(2030, 1, 1),
+                          total_rent=total_rent)
+    db.session.add(occupancy)
+    db.session.commit()
+    return occupancy
+
+
+def per_object_schedule(occupancy, number_of_payments):
+    """The previous schedule path: one ORM object and session.add per installment"""
+    schedule = occupancy.build_payment_schedule(number_of_payments)
+    for row in schedule:
+        db.session.add(Payment(**row))
+    db.session.flush()
+    return [p for p in occupancy.payments]
+
+
+def bulk_schedule(occupancy, number_of_payments):
+    return occupancy.generate_payment_schedule(number_of_payments, commit=False)
+
+
+def bench_payment_schedule(sizes=(12, 120, 1200), repeat=5):
+    """Time schedule generation up to the flush; the commit's fsync is excluded as it is identical"""
+    scratch_app()
+    print(f"{'installments':>12} {'per-object ms':>14} {'bulk ms':>10} {'speedup':>8}")
+    for size in sizes:
+        timings = {}
+        for name, generate in (('per_object', per_object_schedule), ('bulk', bulk_schedule)):
+            best = float('inf')
+            for _ in range(repeat):
+                occupancy = seed_occupancy()
+                started = time.perf_counter()
+                generate(occupancy, size)
+                best = min(best, time.perf_counter() - started)
+                db.session.commit()
+                db.session.expunge_all()
+            timings[name] = best * 1000
+        print(f"{size:>12} {timings['per_object']:>14.2f} {timings['bulk']:>10.2f} "
+              f"{timings['per_object'] / timings['bulk']:>7.1f}x")
+
+
+def logged_in_client(bench_app, email='bench@example.com'):
+    client = bench_app.test_client()
+    client.post('/api/signup', json={
+        'full_name': 'Bench User', 'email': email, 'password': 'benchmark', 'phone_number': '0'
+    })
+    client.post('/login', json={'email': email, 'password': 'benchmark'})
+    return client
+
+
+def hot_endpoints(property_id, occupancy_id=1):
+    return [
+        '/api/dashboard',
+        '/api/properties',
+        '/api/properties/overview',
+        '/api/income',
+        '/api/income/timeseries',
+        '/api/properties/vacant',
+        f'/api/properties/{property_id}',
+        f'/api/properties/{property_id}/full-details',
+        f'/api/properties/{property_id}/income',
+        f'/api/properties/{property_id}/documents',
+        f'/api/properties/{property_id}/notifications',
+        '/api/notifications/check',
+        '/api/occupants',
+        '/api/occupants/overview',
+        f'/api/occupancies/{occupancy_id}',
+        f'/api/occupants/{occupancy_id}/payments',
+        f'/api/occupants/{occupancy_id}/check-delete',
+        '/api/payments/export',
+    ]
+
+
+def check_query_plans():
+    """Run tests/test_query_plans.py, which fails if a hot GET query full-scans a model table"""
+    import pytest
+
+    test_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'test_query_plans.py')
+    return pytest.main(['-q', test_path]) == 0
+
+
+def run_mixed_load(bench_app, user_id, payment_ids, readers=4, writers=2, duration=3.0):
+    """Dashboard readers and payment-status writers hammering one database file"""
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def reader():
+        with bench_app.app_context():
+            while time.perf_counter() < deadline:
+                try:
+                    compute_dashboard(user_id, date.today())
+                    db.session.rollback()
+                    key = 'reads'
+                except OperationalError:
+                    db.session.rollback()
+                    key = 'locked'
+                with lock:
+                    counts[key] += 1
+
+    def writer():
+        with bench_app.app_context():
+            while time.perf_counter() < deadline:
+                try:
+                    db.session.query(Payment).filter(
+                        Payment.payment_id == random.choice(payment_ids)
+                    ).update({'status': random.choice(['due', 'paid'])})
+                    db.session.commit()
+                    key = 'writes'
+                except OperationalError:
+                    db.session.rollback()
+                    key = 'locked'
+                with lock:
+                    counts[key] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {key: value / duration for key, value in counts.items()}
+
+
+def bench_sqlite_concurrency(leases=200):
+    """Reader/writer throughput with default journaling versus the db_config tuning"""
+    print(f"{'mode':>8} {'reads/s':>10} {'writes/s':>10} {'locked/s':>10}")
+    for mode, tuning in (('default', False), ('tuned', True)):
+        bench_app = scratch_app(SQLITE_TUNING=tuning)
+        first = seed_occupancy()
+        user = first.property.owner
+        first.generate_payment_schedule(12)
+        for _ in range(leases - 1):
+            seed_occupancy(user=user).generate_payment_schedule(12)
+        user_id = user.user_id
+        payment_ids = [row[0] for row in db.session.query(Payment.payment_id).all()]
+        compute_dashboard(user_id, date.today())  # build the summary row up front
+        db.session.remove()
+        rates = run_mixed_load(bench_app, user_id, payment_ids)
+        print(f"{mode:>8} {rates['reads']:>10.1f} {rates['writes']:>10.1f} {rates['locked']:>10.1f}")
+
+
+def run_login_load(bench_app, emails, logins=4, readers=2, duration=3.0):
+    """Login threads next to dashboard readers; returns logins/s and dashboard latencies in ms"""
+    counts = {'logins': 0, 'failed': 0}
+    latencies = []
+    lock = threading.Lock()
+    reader_clients = [logged_in_client(bench_app, email) for email in emails[:readers]]
+    deadline = time.perf_counter() + duration
+
+    def login(email):
+        client = bench_app.test_client()
+        while time.perf_counter() < deadline:
+            status = client.post('/login', json={'email': email, 'password': 'benchmark'}).status_code
+            with lock:
+                counts['logins' if status == 200 else 'failed'] += 1
+
+    def reader(client):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            client.get('/api/dashboard')
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=login, args=(emails[i % len(emails)],)) for i in range(logins)]
+    threads += [threading.Thread(target=reader, args=(client,)) for client in reader_clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts['logins'] / duration, counts['failed'], sorted(latencies)
+
+
+def bench_login_load(users=4):
+    """Login throughput and dashboard latency with hashing on the request threads versus the pool"""
+    print(f"{'mode':>8} {'logins/s':>10} {'failed':>8} {'dash p50':>10} {'dash p95':>10}")
+    for mode, workers in (('inline', 0), ('pool', 2)):
+        bench_app = scratch_app(PASSWORD_HASH_WORKERS=workers)
+        emails = [f'login-{i}@example.com' for i in range(users)]
+        for email in emails:
+            logged_in_client(bench_app, email)
+        rate, failed, latencies = run_login_load(bench_app, emails)
+        p50 = statistics.median(latencies)
+        p95 = latencies[int(len(latencies) * 0.95)]
+        print(f"{mode:>8} {rate:>10.1f} {failed:>8} {p50:>10.2f} {p95:>10.2f}")
+
+
+def measure_endpoint(client, url, user_id, property_id, repeat):
+    """Latencies (ms) and query count of uncached requests, then the peak memory of one more"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def get():
+        # Measure the view itself, not a response cache hit
+        response_cache.invalidate(user_id, 'dashboard', 'overview', f'property:{property_id}')
+        response = client.get(url)
+        response.get_data()
+        return response
+
+    get()  # warm up
+    latencies = []
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        for _ in range(repeat):
+            statements.clear()
+            start = time.perf_counter()
+            response = get()
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    # Traced separately: tracemalloc slows every allocation down
+    tracemalloc.start()
+    try:
+        get()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'status': response.status_code,
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)], 3),
+        'queries': len(statements),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def bench_load_test(scales=(10, 100, 1000), payments_per_lease=12, repeat=20):
+    """Hot GET endpoints against seeded portfolios of growing size.
+
+    Writes p50/p95 latency, query count and peak memory per endpoint and scale
+    to LOAD_TEST_REPORT (default load_test_report.json) for diffing between commits.
+    """
+    report = {'revision': git_revision(), 'payments_per_lease': payments_per_lease, 'repeat': repeat, 'scales': {}}
+    templates = hot_endpoints('<property_id>', '<occupancy_id>')
+    print(f"{'properties':>10} {'endpoint':<46} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'peak KiB':>9}")
+    for scale in scales:
+        bench_app = scratch_app(PASSWORD_HASH_WORKERS=0)
+        # A second owner of the same size, so every query has to filter by user
+        email = seed_database(2, scale, payments_per_lease)[0]
+        user_id, property_id, occupancy_id = db.session.query(
+            User.user_id, Property.property_id, Occupancy.occupancy_id
+        ).join(Property.owner).join(Occupancy, Occupancy.property_id == Property.property_id).filter(
+            User.email == email
+        ).first()
+        db.session.remove()
+
+        client = bench_app.test_client()
+        client.post('/login', json={'email': email, 'password': SEED_PASSWORD})
+        results = {}
+        for template, url in zip(templates, hot_endpoints(property_id, occupancy_id)):
+            results[template] = measure_endpoint(client, url, user_id, property_id, repeat)
+            row = results[template]
+            print(f"{scale:>10} {template:<46} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+                  f"{row['queries']:>8} {row['peak_kib']:>9.1f}")
+        report['scales'][str(scale)] = results
+
+    path = os.environ.get('LOAD_TEST_REPORT', 'load_test_report.json')
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+    print(f"report written to {path}")
+    failed = [(scale, url) for scale, results in report['scales'].items()
+              for url, row in results.items() if row['status'] != 200]
+    for scale, url in failed:
+        print(f"FAILED  {url} at {scale} properties")
+    return not failed
+
+
+# Imported on first use by app.py; a worker that boots must not load them
+DEFERRED_IMPORTS = ('numpy', 'alembic', 'PIL')
+
+STARTUP_PROBE = """
+import json, sys, tempfile, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+loaded = [name for name in {deferred!r} if name in sys.modules]
+from benchmarks import scratch_config
+probe_app = app.create_app(scratch_config(tempfile.mkdtemp(prefix='propmanager-bench-')))
+created = time.perf_counter()
+probe_app.test_client().get('/login.html')
+served = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'create_app': created - imported,
+                  'first_request': served - created, 'loaded': loaded}}))
+"""
+
+
+def bench_startup(repeat=5):
+    """Cold import, create_app and first request (which creates the tables) in fresh interpreters"""
+    probe = STARTUP_PROBE.format(deferred=DEFERRED_IMPORTS)
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', probe], check=True, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+
+    print(f"{'phase':>14} {'median ms':>10} {'min ms':>10}")
+    for phase in ('import', 'create_app', 'first_request'):
+        timings = [run[phase] * 1000 for run in runs]
+        print(f"{phase:>14} {statistics.median(timings):>10.1f} {min(timings):>10.1f}")
+    loaded = sorted({name for run in runs for name in run['loaded']})
+    if loaded:
+        print(f"imported at startup: {', '.join(loaded)}")
+    return not loaded
+
+
+BENCHMARKS = {
+    'payment_schedule': bench_payment_schedule,
+    'sqlite_concurrency': bench_sqlite_concurrency,
+    'query_plans': check_query_plans,
+    'startup': bench_startup,
+    'login_load': bench_login_load,
+    'load_test': bench_load_test,
+}
+
+
+if __name__ == '__main__':
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    failed = []
+    for name in selected:
+        print(f"== {name}")
+        if BENCHMARKS[name]() is False:
+            failed.append(name)
+    if failed:
+        print(f"failed: {', '.join(failed)}")
+        sys.exit(1)
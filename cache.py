@@ -0,0 +1,211 @@
+"""Per-user response cache for read-heavy GET endpoints
+
+Cached responses are grouped by (user, group), e.g. (42, 'dashboard') or
+(42, 'property:<id>'). Every group has a version counter that is part of the
+cache key; mutation views bump the versions of the groups they affect, which
+orphans the stale entries without having to scan for them. Orphaned entries
+age out through TTL and LRU eviction.
+
+Group versions live in the backend, so with the in-memory store an
+invalidation only reaches the process that made the write. `data_version`,
+a callable returning a per-user version that every process shares (the
+app's DataVersion), is added to the key as well, so other processes miss
+after the write instead of serving their stale entries.
+
+Backends only need get/set-with-TTL/incr, so the in-memory store can be
+swapped for any Redis-compatible server.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request, session
+
+
+class CacheBackend(ABC):
+    """Interface every cache store implements"""
+
+    @abstractmethod
+    def get(self, key):
+        ...
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        ...
+
+    @abstractmethod
+    def delete(self, key):
+        ...
+
+    @abstractmethod
+    def counter(self, key):
+        ...
+
+    @abstractmethod
+    def incr(self, key):
+        ...
+
+
+class MemoryBackend(CacheBackend):
+    """Thread-safe in-process store with per-entry TTL and LRU eviction.
+
+    Counters live outside the LRU: evicting a group version would reset it and
+    bring back entries that were invalidated.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def counter(self, key):
+        return self.counters.get(key, 0)
+
+    def incr(self, key):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RedisBackend(CacheBackend):
+    """Adapter for a redis-py compatible client (Redis, KeyDB, fakeredis, ...)"""
+
+    def __init__(self, client, prefix='propmanager:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=ttl or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def counter(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+
+class ResponseCache:
+    def __init__(self, backend=None, default_ttl=60, data_version=None):
+        self.backend = backend or MemoryBackend()
+        self.default_ttl = default_ttl
+        self.data_version = data_version
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def version_key(self, user_id, group):
+        return f"version:{user_id}:{group}"
+
+    def group_version(self, user_id, group):
+        return self.backend.counter(self.version_key(user_id, group))
+
+    def invalidate(self, user_id, *groups):
+        """Drop every cached response of the given groups for one user"""
+        for group in groups:
+            self.backend.incr(self.version_key(user_id, group))
+        with self.lock:
+            self.invalidations += len(groups)
+
+    def cached(self, group, ttl=None):
+        """Cache successful GET responses of a view per user.
+
+        group may reference view arguments, e.g. 'property:{property_id}'.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                user_id = session.get('user_id')
+                if request.method != 'GET' or user_id is None:
+                    return view(*args, **kwargs)
+
+                group_name = group.format(**kwargs)
+                version = self.group_version(user_id, group_name)
+                if self.data_version is not None:
+                    version = f"{version}.{self.data_version(user_id)}"
+                key = f"response:{user_id}:{group_name}:{version}:{request.full_path}"
+
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self.record(hit=True)
+                    # Entries are stored as b"<mimetype>\n<body>" so any byte store can hold them
+                    mimetype, body = entry.split(b'\n', 1)
+                    response = Response(body, status=200, mimetype=mimetype.decode())
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self.record(hit=False)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    entry = response.mimetype.encode() + b'\n' + response.get_data()
+                    self.backend.set(key, entry, ttl or self.default_ttl)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0,
+                'invalidations': self.invalidations,
+                'backend': type(self.backend).__name__
+            }
+
+
+def backend_from_config(config):
+    """Build the backend named by RESPONSE_CACHE_REDIS_URL, or the in-memory store"""
+    redis_url = config.get('RESPONSE_CACHE_REDIS_URL')
+    if not redis_url:
+        return MemoryBackend(max_entries=config.get('RESPONSE_CACHE_MAX_ENTRIES', 2048))
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError("RESPONSE_CACHE_REDIS_URL is set but the redis package is not installed")
+    return RedisBackend(redis.Redis.from_url(redis_url))
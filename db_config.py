@@ -0,0 +1,99 @@
+"""SQLite engine configuration: connection pragmas and pool policy
+
+Settings are read from the Flask config when each engine is created:
+
+    SQLITE_TUNING          apply the pragmas below (default True)
+    SQLITE_PRAGMAS         dict merged over DEFAULT_PRAGMAS
+    SQLITE_POOL_CLASS      'queue', 'null', 'singleton' or 'static' (default 'queue')
+    SQLITE_POOL_SIZE       connections kept open by a queue pool (default 10)
+    SQLITE_MAX_OVERFLOW    extra connections allowed under burst (default 10)
+    SQLITE_POOL_TIMEOUT    seconds to wait for a free connection (default 30)
+"""
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool, QueuePool, SingletonThreadPool, StaticPool
+
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',           # readers no longer block the writer
+    'synchronous': 'NORMAL',         # fsync at checkpoints only; safe with WAL
+    'cache_size': -64000,            # 64 MiB page cache per connection
+    'mmap_size': 268435456,          # memory-map up to 256 MiB of the file
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,            # wait up to 5s for a lock instead of failing
+}
+
+POOL_CLASSES = {
+    'queue': QueuePool,
+    'null': NullPool,
+    'singleton': SingletonThreadPool,
+    'static': StaticPool,
+}
+
+
+def is_sqlite(url):
+    return str(url).startswith('sqlite')
+
+
+def is_memory_database(url):
+    url = str(url)
+    return url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in url
+
+
+def pool_options(config, url):
+    """Engine keyword arguments for an explicit, thread-safe pool"""
+    if is_memory_database(url):
+        # Every pooled connection would otherwise see its own empty database
+        return {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+
+    pool_name = config.get('SQLITE_POOL_CLASS', 'queue')
+    if pool_name not in POOL_CLASSES:
+        raise ValueError(f"Unknown SQLITE_POOL_CLASS: {pool_name}")
+
+    options = {
+        'poolclass': POOL_CLASSES[pool_name],
+        # Connections are handed between worker threads by the pool
+        'connect_args': {'check_same_thread': False},
+    }
+    if pool_name == 'queue':
+        options.update(
+            pool_size=config.get('SQLITE_POOL_SIZE', 10),
+            max_overflow=config.get('SQLITE_MAX_OVERFLOW', 10),
+            pool_timeout=config.get('SQLITE_POOL_TIMEOUT', 30),
+        )
+    return options
+
+
+def install_pragmas(engine, pragmas):
+    """Run the pragmas on every new DBAPI connection the engine opens"""
+    statements = [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+class TunedSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy extension that applies the SQLite tuning to each engine it creates"""
+
+    def _make_engine(self, bind_key, options, app):
+        url = options['url']
+        if is_sqlite(url):
+            for key, value in pool_options(app.config, url).items():
+                options.setdefault(key, value)
+
+        engine = super()._make_engine(bind_key, options, app)
+
+        if is_sqlite(url) and app.config.get('SQLITE_TUNING', True):
+            pragmas = dict(DEFAULT_PRAGMAS)
+            pragmas.update(app.config.get('SQLITE_PRAGMAS', {}))
+            if is_memory_database(url):
+                pragmas.pop('journal_mode', None)
+                pragmas.pop('mmap_size', None)
+            install_pragmas(engine, pragmas)
+        return engine
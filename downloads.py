@@ -0,0 +1,131 @@
+"""File responses with validators, byte ranges and proxy offload
+
+send_stored_file answers If-None-Match / If-Modified-Since with 304 and a
+single-range Range request with 206. The body is never read in Python when
+it does not have to be:
+
+* offload='x-sendfile' or 'x-accel-redirect' returns headers only and lets
+  Apache/lighttpd or nginx stream the file (they handle ranges themselves);
+* otherwise full bodies go through the server's wsgi.file_wrapper, which
+  gunicorn and uWSGI turn into os.sendfile. Only partial bodies, and servers
+  without a file wrapper, fall back to chunked reads.
+"""
+import mimetypes
+import os
+from datetime import date, datetime, time, timezone
+
+from flask import Response, request
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified, parse_date, unquote_etag
+from werkzeug.wsgi import FileWrapper
+
+
+OFFLOAD_MODES = (None, 'x-sendfile', 'x-accel-redirect')
+
+
+def iter_file_range(file, length, chunk_size):
+    """Yield exactly `length` bytes from the file's current position, then close it"""
+    try:
+        while length > 0:
+            data = file.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def as_utc_datetime(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, date):
+        return datetime.combine(value, time.min, tzinfo=timezone.utc)
+    return None
+
+
+def if_range_matches(header, etag, last_modified):
+    """Whether a Range request may be honored under its If-Range header (RFC 9110 13.1.5).
+
+    The header holds either an entity tag, which must be strong and equal to
+    the file's, or an HTTP date, which must equal its Last-Modified time.
+    """
+    if header is None:
+        return True
+    header = header.strip()
+    if header.startswith(('"', 'W/')):
+        tag, weak = unquote_etag(header)
+        return not weak and tag == etag
+    when = parse_date(header)
+    # Last-Modified is sent with one-second precision
+    return when is not None and last_modified is not None and when == last_modified.replace(microsecond=0)
+
+
+def send_stored_file(path, download_name, size=None, etag=None, last_modified=None, max_age=0,
+                     offload=None, root=None, accel_prefix='/protected/', chunk_size=64 * 1024):
+    """Download response for a file on disk.
+
+    size and etag may come from stored metadata; when they are missing the
+    open file is stat'ed instead. Raises FileNotFoundError if the file is gone.
+    """
+    if offload not in OFFLOAD_MODES:
+        raise ValueError(f"Unknown download offload mode: {offload}")
+
+    file = open(path, 'rb')
+    try:
+        if size is None or etag is None:
+            stat = os.fstat(file.fileno())
+            size = stat.st_size if size is None else size
+            etag = etag or f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+            last_modified = last_modified or datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+        last_modified = as_utc_datetime(last_modified)
+
+        response = Response(mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream')
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.max_age = max_age
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            file.close()
+            response.status_code = 304
+            return response
+
+        if offload == 'x-sendfile':
+            file.close()
+            response.headers['X-Sendfile'] = os.path.abspath(path)
+            return response
+        if offload == 'x-accel-redirect':
+            file.close()
+            relative = os.path.relpath(os.path.abspath(path), os.path.abspath(root)).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative
+            return response
+
+        byte_range = request.range
+        if byte_range is not None and not if_range_matches(request.headers.get('If-Range'), etag, last_modified):
+            byte_range = None  # the client's copy is stale: send the whole file
+        if byte_range is not None and len(byte_range.ranges) == 1:
+            bounds = byte_range.range_for_length(size)
+            if bounds is None:
+                file.close()
+                response.status_code = 416
+                response.content_range = ContentRange('bytes', None, None, size)
+                return response
+            start, stop = bounds
+            file.seek(start)
+            response.status_code = 206
+            response.content_range = ContentRange('bytes', start, stop, size)
+            response.response = iter_file_range(file, stop - start, chunk_size)
+            response.content_length = stop - start
+        else:
+            file_wrapper = request.environ.get('wsgi.file_wrapper', FileWrapper)
+            response.response = file_wrapper(file, chunk_size)
+            response.content_length = size
+        response.direct_passthrough = True
+        return response
+    except BaseException:
+        file.close()
+        raise
@@ -0,0 +1,38 @@
+"""add composite indexes for hot filters
+
+Revision ID: 4655c0e952db
+Revises: 
+Create Date: 2026-10-17 20:17:52.805860
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4655c0e952db'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_properties_user_id_occupancy_status', 'properties', ['user_id', 'occupancy_status']),
+    ('ix_occupancy_property_id', 'occupancy', ['property_id']),
+    ('ix_payments_occupancy_id_status_due_date', 'payments', ['occupancy_id', 'status', 'due_date']),
+    ('ix_documents_property_id', 'documents', ['property_id']),
+    ('ix_notifications_property_id_type_active', 'notifications',
+     ['property_id', 'notification_type', 'is_active']),
+]
+
+
+def upgrade():
+    # Databases created after these indexes were added to the models already
+    # have them from db.create_all()
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,39 @@
+"""add content-addressed document columns
+
+Revision ID: 9b1e6f3c2a7d
+Revises: 4655c0e952db
+Create Date: 2026-10-17 21:40:12.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1e6f3c2a7d'
+down_revision = '4655c0e952db'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() already gives new databases these columns
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('documents')}
+    columns = [
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('content_hash', sa.String(length=64), nullable=True),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+    ]
+    with op.batch_alter_table('documents') as batch_op:
+        for column in columns:
+            if column.name not in existing:
+                batch_op.add_column(column)
+    op.create_index('ix_documents_content_hash', 'documents', ['content_hash'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.drop_index('ix_documents_content_hash')
+        batch_op.drop_column('file_size')
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('filename')
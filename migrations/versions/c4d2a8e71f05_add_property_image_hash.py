@@ -0,0 +1,30 @@
+"""add property image hash
+
+Revision ID: c4d2a8e71f05
+Revises: 9b1e6f3c2a7d
+Create Date: 2026-10-17 22:58:41.905117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d2a8e71f05'
+down_revision = '9b1e6f3c2a7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() already gives new databases the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('properties')}
+    if 'image_hash' in columns:
+        return
+    with op.batch_alter_table('properties') as batch_op:
+        batch_op.add_column(sa.Column('image_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('properties') as batch_op:
+        batch_op.drop_column('image_hash')
@@ -0,0 +1,30 @@
+"""add notification outbox retry time
+
+Revision ID: d7e3b1f4a920
+Revises: e1a7c5b93d28
+Create Date: 2026-10-18 10:12:03.418226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e3b1f4a920'
+down_revision = 'e1a7c5b93d28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() already gives new databases the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('notification_outbox')}
+    if 'next_attempt_at' in columns:
+        return
+    with op.batch_alter_table('notification_outbox') as batch_op:
+        batch_op.add_column(sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('notification_outbox') as batch_op:
+        batch_op.drop_column('next_attempt_at')
@@ -0,0 +1,125 @@
+"""add derived and queue tables
+
+Revision ID: e1a7c5b93d28
+Revises: c4d2a8e71f05
+Create Date: 2026-10-18 09:41:27.602113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a7c5b93d28'
+down_revision = 'c4d2a8e71f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases set up by init_db already have these tables from db.create_all();
+    # the derived ones (due_events, income_rollup) are backfilled by init_db
+    op.create_table(
+        'rendition_jobs',
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('source_path', sa.String(length=500), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('renditions', sa.Text(), nullable=True),
+        sa.Column('error', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('job_id'),
+        sa.UniqueConstraint('content_hash'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'portfolio_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total_properties', sa.Integer(), nullable=False),
+        sa.Column('occupied_properties', sa.Integer(), nullable=False),
+        sa.Column('vacant_properties', sa.Integer(), nullable=False),
+        sa.Column('total_tenants', sa.Integer(), nullable=False),
+        sa.Column('total_income', sa.Float(), nullable=False),
+        sa.Column('total_pending', sa.Float(), nullable=False),
+        sa.Column('total_expected', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'data_versions',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('user_id'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'income_rollup',
+        sa.Column('property_id', sa.String(length=20), nullable=False),
+        sa.Column('period', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('expected', sa.Float(), nullable=False),
+        sa.Column('collected', sa.Float(), nullable=False),
+        sa.Column('outstanding', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['property_id'], ['properties.property_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('property_id', 'period'),
+        if_not_exists=True
+    )
+    op.create_index('ix_income_rollup_user_id_period', 'income_rollup', ['user_id', 'period'],
+                    unique=False, if_not_exists=True)
+    op.create_table(
+        'due_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('property_id', sa.String(length=20), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('ref_id', sa.Integer(), nullable=False),
+        sa.Column('event_date', sa.Date(), nullable=False),
+        sa.Column('fire_date', sa.Date(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['property_id'], ['properties.property_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_due_events_fire_date', 'due_events', ['fire_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_due_events_property_id', 'due_events', ['property_id'], unique=False, if_not_exists=True)
+    # next_attempt_at is added by d7e3b1f4a920
+    op.create_table(
+        'notification_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('property_id', sa.String(length=20), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('ref_id', sa.Integer(), nullable=False),
+        sa.Column('event_date', sa.Date(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['property_id'], ['properties.property_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'ref_id', 'event_date', name='uq_notification_outbox_event'),
+        if_not_exists=True
+    )
+    op.create_index('ix_notification_outbox_sent_at', 'notification_outbox', ['sent_at'],
+                    unique=False, if_not_exists=True)
+    op.create_index('ix_notification_outbox_user_id_event_date', 'notification_outbox', ['user_id', 'event_date'],
+                    unique=False, if_not_exists=True)
+    op.create_index('ix_notification_outbox_property_id', 'notification_outbox', ['property_id'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_table('notification_outbox')
+    op.drop_table('due_events')
+    op.drop_table('income_rollup')
+    op.drop_table('data_versions')
+    op.drop_table('portfolio_summary')
+    op.drop_table('rendition_jobs')
@@ -0,0 +1,25 @@
+"""add due events user and fire date index
+
+Revision ID: f2b8d4a6c013
+Revises: d7e3b1f4a920
+Create Date: 2026-10-18 11:05:48.271930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d4a6c013'
+down_revision = 'd7e3b1f4a920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_due_events_user_id_fire_date', 'due_events', ['user_id', 'fire_date'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_due_events_user_id_fire_date', table_name='due_events', if_exists=True)
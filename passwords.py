@@ -0,0 +1,104 @@
+"""Password hashing off the request threads
+
+Werkzeug's KDFs (scrypt by default, or PBKDF2) cost tens of milliseconds of
+CPU per call by design. PasswordHasher runs them on a small process pool so a
+burst of logins occupies at most `max_workers` cores and leaves the request
+threads free to serve everything else. At most `max_pending` hashes may be
+queued or running; beyond that hash()/verify() raise HasherBusy instead of
+piling up work, and the login view answers 503.
+
+`method` is any Werkzeug method string, e.g. 'scrypt:32768:8:1' or
+'pbkdf2:sha256:600000'. needs_rehash() tells whether a stored hash was made
+with different parameters, so logins can upgrade it transparently.
+
+A worker that dies (OOM kill, crash) breaks the whole pool; it is then
+replaced and the hash retried once, so one crash does not fail every later
+login.
+
+max_workers=0 hashes on the calling thread. Like renditions.py, this module
+must not import app: pool processes are spawned and import only this file.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+SCRYPT_DEFAULTS = ('32768', '8', '1')
+
+
+class HasherBusy(Exception):
+    """Too many hashes are queued already"""
+
+
+def normalize_method(method):
+    """Spell out the defaults Werkzeug fills in, as they appear in stored hashes"""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        return ':'.join(['scrypt', *args, *SCRYPT_DEFAULTS[len(args):]])
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = args[1] if len(args) > 1 else str(DEFAULT_PBKDF2_ITERATIONS)
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Unsupported password hash method: {method}")
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', max_workers=2, max_pending=32, timeout=10):
+        self.executor = None
+        self.lock = threading.Lock()
+        self.configure(method, max_workers, max_pending, timeout)
+
+    def configure(self, method, max_workers, max_pending=32, timeout=10):
+        if self.executor is not None and max_workers != self.max_workers:
+            self.shutdown()
+        self.method = normalize_method(method)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max(max_pending, 1))
+
+    def run(self, function, *args):
+        if not self.max_workers:
+            return function(*args)
+        if not self.slots.acquire(timeout=self.timeout):
+            raise HasherBusy('Password hashing queue is full')
+        try:
+            executor = self.pool()
+            try:
+                return executor.submit(function, *args).result()
+            except BrokenProcessPool:
+                self.discard(executor)
+                return self.pool().submit(function, *args).result()
+        finally:
+            self.slots.release()
+
+    def pool(self):
+        with self.lock:
+            if self.executor is None:
+                # spawn, not fork: the parent holds threads and open SQLite connections
+                self.executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self.executor
+
+    def discard(self, executor):
+        """Forget a broken pool so the next call starts a new one"""
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False)
+
+    def hash(self, password):
+        return self.run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self.run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.method
+
+    def shutdown(self, wait=True):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
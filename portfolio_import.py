@@ -0,0 +1,139 @@
+"""Row readers for bulk portfolio imports
+
+iter_rows(stream, format) turns a binary stream into (row number, dict)
+pairs without reading the whole file first:
+
+* 'csv': a header line, then one property per line. Empty cells count as
+  missing, so a property without a lease simply leaves the tenant columns
+  blank. Row numbers are line numbers.
+* 'json': a JSON array of objects, or one object per line (JSON Lines).
+  Row numbers count objects from 1. A JSON Lines file is decoded line by
+  line, so a malformed line becomes an InvalidRow for that row only. An
+  array is decoded as each object's closing brace arrives; since a broken
+  array cannot be resynchronized, a malformed element, or one larger than
+  MAX_ROW_SIZE characters, stops the file with ImportFormatError.
+
+Memory stays bounded by MAX_ROW_SIZE plus one read chunk either way.
+
+Validation and writing live in app.import_portfolio.
+"""
+import csv
+import io
+import json
+
+
+IMPORT_FORMATS = ('csv', 'json')
+MIMETYPE_FORMATS = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'application/json': 'json',
+    'application/x-ndjson': 'json',
+    'application/jsonl': 'json',
+}
+
+
+MAX_ROW_SIZE = 1024 * 1024
+
+
+class ImportFormatError(ValueError):
+    """The file itself cannot be read any further"""
+
+
+class InvalidRow(ValueError):
+    """Yielded in place of a row that cannot be decoded; the rows after it still can"""
+
+
+def format_for(mimetype=None, filename=None):
+    """Import format named by a content type or a file extension, or None"""
+    if mimetype in MIMETYPE_FORMATS:
+        return MIMETYPE_FORMATS[mimetype]
+    if filename:
+        extension = filename.rsplit('.', 1)[-1].lower()
+        if extension in ('csv', 'json', 'jsonl', 'ndjson'):
+            return 'csv' if extension == 'csv' else 'json'
+    return None
+
+
+def iter_csv_rows(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    try:
+        for row in reader:
+            yield reader.line_num, {
+                key.strip(): value.strip() for key, value in row.items()
+                if key and isinstance(value, str) and value.strip()
+            }
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ImportFormatError(f"Unreadable CSV after line {reader.line_num}: {e}")
+
+
+def iter_json_rows(stream, chunk_size=64 * 1024, max_row_size=MAX_ROW_SIZE):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    try:
+        first = text.read(1)
+        while first.isspace():
+            first = text.read(1)
+        if first == '[':
+            yield from iter_json_array(text, chunk_size, max_row_size)
+        elif first:
+            yield from iter_json_lines(text, first, max_row_size)
+    except UnicodeDecodeError as e:
+        raise ImportFormatError(f"Unreadable JSON: {e}")
+
+
+def iter_json_lines(text, first, max_row_size):
+    row_number = 0
+    line = first + text.readline(max_row_size)
+    while line:
+        if line.strip():
+            row_number += 1
+            if len(line) >= max_row_size and not line.endswith('\n'):
+                # Skip the rest of the oversized line without holding it
+                while line and not line.endswith('\n'):
+                    line = text.readline(max_row_size)
+                yield row_number, InvalidRow(f"Row is larger than {max_row_size} characters")
+            else:
+                try:
+                    yield row_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield row_number, InvalidRow(f"Malformed JSON: {e.msg}")
+        line = text.readline(max_row_size)
+
+
+def iter_json_array(text, chunk_size, max_row_size):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    row_number = 0
+    exhausted = False
+    while True:
+        # Separators and blank space between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        if position == len(buffer):
+            if exhausted:
+                raise ImportFormatError(f"JSON array not closed after row {row_number}")
+            buffer, position = text.read(chunk_size), 0
+            exhausted = not buffer
+            continue
+        try:
+            value, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            if exhausted or len(buffer) - position > max_row_size:
+                raise ImportFormatError(f"Malformed or oversized JSON in row {row_number + 1}: {e.msg}")
+            # The element is split across chunks: keep its start and read on
+            chunk = text.read(chunk_size)
+            exhausted = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        row_number += 1
+        yield row_number, value
+
+
+def iter_rows(stream, format):
+    if format == 'csv':
+        return iter_csv_rows(stream)
+    if format == 'json':
+        return iter_json_rows(stream)
+    raise ImportFormatError(f"Unsupported import format: {format}")
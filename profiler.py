@@ -0,0 +1,187 @@
+"""Per-request SQL and serialization profiling
+
+QueryProfiler listens to the SQLAlchemy engines (before/after_cursor_execute)
+and to the Flask request hooks. For every request it records:
+
+* the number of statements and the time spent in the database;
+* the slowest statements;
+* the time jsonify spent serializing (TimedJSONProvider);
+* how often each statement shape ran. A shape is the SQL with literals and
+  IN lists collapsed, so the same lookup by different ids is counted together.
+
+The numbers go to a Server-Timing header, which browser dev tools show next
+to the request, and into per-endpoint totals for /api/_metrics. A shape that
+runs more than `n_plus_one_threshold` times in one request is logged as a
+probable N+1, and so is every statement slower than `slow_query_ms`.
+
+The totals are per process, like the response cache statistics.
+"""
+import logging
+import re
+import threading
+import time
+
+from flask import g, has_app_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'\bIN \(\?(?:, \?)*\)', re.IGNORECASE)
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def statement_shape(statement):
+    """SQL with whitespace, literals and IN lists normalized"""
+    shape = LITERAL.sub('?', ' '.join(statement.split()))
+    return IN_LIST.sub('IN (?)', shape)
+
+
+def current_profile():
+    return g.get('query_profile') if has_app_context() else None
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        # Raw statement -> executions; shapes are only computed once, at the end
+        self.statements = {}
+        self.timings = []
+
+    def record(self, statement, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+        self.timings.append((duration, statement))
+
+    def slowest(self, limit):
+        return sorted(self.timings, key=lambda timing: timing[0], reverse=True)[:limit]
+
+    def shape_counts(self):
+        counts = {}
+        for statement, executions in self.statements.items():
+            shape = statement_shape(statement)
+            counts[shape] = counts.get(shape, 0) + executions
+        return counts
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Adds the time spent building JSON responses to the request profile"""
+
+    def response(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().response(*args, **kwargs)
+        finally:
+            profile = current_profile()
+            if profile is not None:
+                profile.serialize_time += time.perf_counter() - started
+
+
+class QueryProfiler:
+    def __init__(self, n_plus_one_threshold=10, slow_query_ms=250, slowest=5, server_timing=True):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_query_ms = slow_query_ms
+        self.slowest = slowest
+        self.server_timing = server_timing
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def init_app(self, app, engines):
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+        app.json = TimedJSONProvider(app)
+        app.before_request(self.start_request)
+        app.after_request(self.add_server_timing)
+        # Teardown runs after a streamed response is consumed, so its queries count too
+        app.teardown_request(self.finish_request)
+
+    # The start time lives on the execution context, which is discarded with the
+    # statement, so a statement that fails leaves nothing behind on the connection
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if current_profile() is not None and context is not None:
+            context._query_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile()
+        started = getattr(context, '_query_started', None)
+        if profile is None or started is None:
+            return
+        duration = time.perf_counter() - started
+        profile.record(statement, duration)
+        if self.slow_query_ms and duration * 1000 >= self.slow_query_ms:
+            logger.warning("slow query (%.1f ms) in %s: %s", duration * 1000, request.endpoint,
+                           ' '.join(statement.split()))
+
+    def start_request(self):
+        g.query_profile = RequestProfile()
+
+    def add_server_timing(self, response):
+        profile = current_profile()
+        if profile is not None and self.server_timing:
+            total = time.perf_counter() - profile.started
+            response.headers.add('Server-Timing', f'db;dur={profile.db_time * 1000:.2f};desc="{profile.queries} queries"')
+            response.headers.add('Server-Timing', f'serialize;dur={profile.serialize_time * 1000:.2f}')
+            response.headers.add('Server-Timing', f'app;dur={total * 1000:.2f}')
+        return response
+
+    def finish_request(self, error=None):
+        profile = g.pop('query_profile', None)
+        if profile is None or request.endpoint is None:
+            return
+        total = time.perf_counter() - profile.started
+        repeated = {}
+        if self.n_plus_one_threshold:
+            repeated = {shape: count for shape, count in profile.shape_counts().items()
+                        if count > self.n_plus_one_threshold}
+            for shape, count in repeated.items():
+                logger.warning("possible N+1 in %s: %d executions of %s", request.endpoint, count, shape)
+        self.record(request.endpoint, profile, total, repeated)
+
+    def record(self, endpoint, profile, total, repeated):
+        with self.lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'serialize_ms': 0.0,
+                'total_ms': 0.0, 'max_ms': 0.0, 'slowest': [], 'n_plus_one': {}
+            })
+            stats['requests'] += 1
+            stats['queries'] += profile.queries
+            stats['max_queries'] = max(stats['max_queries'], profile.queries)
+            stats['db_ms'] += profile.db_time * 1000
+            stats['serialize_ms'] += profile.serialize_time * 1000
+            stats['total_ms'] += total * 1000
+            stats['max_ms'] = max(stats['max_ms'], total * 1000)
+            slowest = stats['slowest'] + [(duration * 1000, statement_shape(statement))
+                                          for duration, statement in profile.slowest(self.slowest)]
+            stats['slowest'] = sorted(slowest, key=lambda timing: timing[0], reverse=True)[:self.slowest]
+            for shape, count in repeated.items():
+                stats['n_plus_one'][shape] = max(stats['n_plus_one'].get(shape, 0), count)
+
+    def stats(self):
+        """Per-endpoint totals and averages, slowest endpoints first"""
+        with self.lock:
+            endpoints = {
+                endpoint: {
+                    'requests': stats['requests'],
+                    'avg_queries': round(stats['queries'] / stats['requests'], 2),
+                    'max_queries': stats['max_queries'],
+                    'avg_db_ms': round(stats['db_ms'] / stats['requests'], 3),
+                    'avg_serialize_ms': round(stats['serialize_ms'] / stats['requests'], 3),
+                    'avg_ms': round(stats['total_ms'] / stats['requests'], 3),
+                    'max_ms': round(stats['max_ms'], 3),
+                    'slowest_statements': [{'ms': round(ms, 3), 'statement': shape} for ms, shape in stats['slowest']],
+                    'n_plus_one': [{'executions': count, 'statement': shape}
+                                   for shape, count in stats['n_plus_one'].items()]
+                }
+                for endpoint, stats in self.endpoints.items()
+            }
+        return dict(sorted(endpoints.items(), key=lambda item: item[1]['avg_ms'] * item[1]['requests'], reverse=True))
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
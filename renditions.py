@@ -0,0 +1,148 @@
+"""Resized renditions of property photos and document previews
+
+render() runs in a worker process of a RenditionPool, never on a request
+thread. For every size in RENDITION_SIZES it writes one file per format the
+installed Pillow can encode (WebP, and AVIF on Pillow 11.3+ or with the
+pillow-avif plugin) into a directory named after the source blob's hash:
+
+    <output_root>/<hash[0:2]>/<hash>/<size>.<format>
+
+Renditions are derived from content only, so identical uploads share them.
+PDFs get a first-page preview when PyMuPDF is installed. Pillow itself is
+optional: without it every job ends as 'unsupported' and callers fall back
+to the original image.
+
+This module must not import app: worker processes are spawned and import
+only what render() needs.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+RENDITION_SIZES = {
+    'thumb': 320,
+    'card': 640,
+    'large': 1280,
+}
+RENDITION_FORMATS = ('webp', 'avif')
+
+
+class RenditionUnsupported(Exception):
+    """The source type, or the libraries needed to read it, are not available"""
+
+
+def rendition_dir(output_root, digest):
+    return os.path.join(output_root, digest[:2], digest)
+
+
+def open_first_page(source_path):
+    from PIL import Image
+
+    with open(source_path, 'rb') as source:
+        is_pdf = source.read(5) == b'%PDF-'
+    if not is_pdf:
+        image = Image.open(source_path)
+        image.seek(0)  # first frame of animated GIF/WebP
+        return image
+
+    try:
+        import fitz
+    except ImportError:
+        raise RenditionUnsupported('PDF previews need PyMuPDF')
+    with fitz.open(source_path) as document:
+        pixmap = document[0].get_pixmap(dpi=150)
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def render(source_path, output_root, digest, sizes=RENDITION_SIZES, formats=RENDITION_FORMATS, quality=80):
+    """Write the renditions of one blob; returns {size: {format: URL path under output_root}}"""
+    try:
+        from PIL import Image, UnidentifiedImageError
+    except ImportError:
+        raise RenditionUnsupported('Pillow is not installed')
+
+    try:
+        image = open_first_page(source_path)
+    except UnidentifiedImageError:
+        raise RenditionUnsupported('Not an image Pillow can read')
+
+    Image.registered_extensions()  # load the encoder plugins
+    encodable = [fmt for fmt in formats if fmt.upper() in Image.SAVE]
+    if not encodable:
+        raise RenditionUnsupported('No rendition format can be encoded')
+
+    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    output_dir = rendition_dir(output_root, digest)
+    os.makedirs(output_dir, exist_ok=True)
+
+    renditions = {}
+    for name, width in sizes.items():
+        resized = image.copy()
+        # Bound both sides so tall scans do not come out huge; never upscale
+        resized.thumbnail((width, width), Image.LANCZOS)
+        renditions[name] = {}
+        for fmt in encodable:
+            filename = f"{name}.{fmt}"
+            temp_path = os.path.join(output_dir, f".{filename}.{os.getpid()}")
+            resized.save(temp_path, fmt.upper(), quality=quality)
+            os.replace(temp_path, os.path.join(output_dir, filename))
+            renditions[name][fmt] = f"{digest[:2]}/{digest}/{filename}"
+    return renditions
+
+
+class RenditionPool:
+    """Lazily started process pool; on_done(job_id, renditions, error) runs in the parent.
+
+    A worker that dies breaks the whole pool: its jobs end with the
+    BrokenProcessPool error and the next submit starts a new pool.
+    """
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def submit(self, job_id, source_path, output_root, digest, on_done):
+        executor = self.pool()
+        try:
+            future = executor.submit(render, source_path, output_root, digest)
+        except BrokenProcessPool:
+            self.discard(executor)
+            executor = self.pool()
+            future = executor.submit(render, source_path, output_root, digest)
+
+        def finished(future):
+            try:
+                renditions, error = future.result(), None
+            except BrokenProcessPool as e:
+                self.discard(executor)
+                renditions, error = None, e
+            except Exception as e:
+                renditions, error = None, e
+            on_done(job_id, renditions, error)
+
+        future.add_done_callback(finished)
+        return future
+
+    def pool(self):
+        with self.lock:
+            if self.executor is None:
+                # spawn, not fork: the parent holds threads and open SQLite connections
+                self.executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self.executor
+
+    def discard(self, executor):
+        """Forget a broken pool so the next submit starts a new one"""
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False)
+
+    def shutdown(self, wait=True):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
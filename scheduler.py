@@ -0,0 +1,98 @@
+"""Background workers for the notification outbox
+
+A PeriodicWorker runs a job on a daemon thread every `interval` seconds.
+app.py starts two of them from init_app: one that evaluates the notification
+rules every hour and writes the results to the outbox, and one that hands
+undelivered outbox rows to a sender in batches.
+
+Senders take a list of (recipient, subject, body) messages and return the
+positions of the ones delivered, so one refused recipient does not cost the
+rest of the batch. LogSender is the local mock; SMTPSender delivers a whole
+batch over one SMTP connection.
+"""
+import logging
+import smtplib
+import threading
+from email.message import EmailMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicWorker:
+    def __init__(self, name, interval, job):
+        self.name = name
+        self.interval = interval
+        self.job = job
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+            self.thread.start()
+        return self
+
+    def run(self):
+        # Run once at startup so a restart never skips a day
+        while not self.stopped.is_set():
+            try:
+                self.job()
+            except Exception:
+                logger.exception("%s failed", self.name)
+            self.stopped.wait(self.interval)
+
+    def stop(self, timeout=None):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+class LogSender:
+    """Mock delivery: logs every message and keeps the last batch for inspection"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, messages):
+        self.sent = list(messages)
+        for recipient, subject, body in self.sent:
+            logger.info("notification to %s: %s - %s", recipient, subject, body)
+        return list(range(len(self.sent)))
+
+
+class SMTPSender:
+    def __init__(self, host, port=25, sender='noreply@localhost'):
+        self.host = host
+        self.port = port
+        self.sender = sender
+
+    def send(self, messages):
+        delivered = []
+        with smtplib.SMTP(self.host, self.port) as smtp:
+            for position, (recipient, subject, body) in enumerate(messages):
+                message = EmailMessage()
+                message['From'] = self.sender
+                message['To'] = recipient
+                message['Subject'] = subject
+                message.set_content(body)
+                try:
+                    smtp.send_message(message)
+                except smtplib.SMTPServerDisconnected:
+                    logger.warning("SMTP connection lost after %d of %d messages", len(delivered), len(messages))
+                    break
+                except smtplib.SMTPException as e:
+                    # Refused recipient or message: the others still go out
+                    logger.warning("notification to %s refused: %s", recipient, e)
+                    continue
+                delivered.append(position)
+        return delivered
+
+
+def sender_from_config(config):
+    """SMTPSender when NOTIFICATION_SMTP_HOST is set, the logging mock otherwise"""
+    host = config.get('NOTIFICATION_SMTP_HOST')
+    if not host:
+        return LogSender()
+    return SMTPSender(host, config.get('NOTIFICATION_SMTP_PORT', 25),
+                      config.get('NOTIFICATION_MAIL_FROM', 'noreply@localhost'))
@@ -0,0 +1,60 @@
+"""Synthetic portfolios for `flask seed` and the load-test benchmark
+
+generate_portfolio() yields rows in the shape app.write_import_batch takes:
+(property row, occupancy row or None, payment statuses). Leases started up
+to one schedule length ago, so every portfolio has paid, overdue and
+upcoming installments, and some end soon enough to trigger lease renewal
+notifications. Apart from the property ids, a random.Random with the same
+seed always produces the same rows.
+"""
+import uuid
+from datetime import timedelta
+
+
+CITIES = ('Dubai', 'Abu Dhabi', 'Sharjah', 'Ajman', 'Al Ain', 'Ras Al Khaimah')
+STREETS = ('Al Wasl Rd', 'Jumeirah St', 'Corniche Rd', 'Hamdan St', 'King Faisal St', 'Sheikh Zayed Rd')
+PROPERTY_TYPES = ('apartment', 'villa', 'townhouse', 'studio', 'office')
+TENANT_NAMES = ('Aisha', 'Omar', 'Fatima', 'Yousef', 'Mariam', 'Khalid', 'Noura', 'Hassan', 'Layla', 'Saeed')
+
+
+def generate_portfolio(rng, user_id, properties, payments_per_lease, today, occupied=0.8, on_time=0.9):
+    """Rows of one owner's portfolio; `occupied` is the share of leased properties"""
+    for i in range(properties):
+        bedrooms = rng.randint(0, 5)
+        rent_per_month = round(rng.uniform(2000, 15000), -2)
+        property_row = {
+            'property_id': str(uuid.uuid4())[:20],
+            'user_id': user_id,
+            'property_type': rng.choice(PROPERTY_TYPES),
+            'street_name': f"{rng.randint(1, 400)} {rng.choice(STREETS)}",
+            'city': rng.choice(CITIES),
+            'building_details': f"Unit {i + 1}",
+            'size_sqft': float(400 + 350 * bedrooms + rng.randint(0, 300)),
+            'bedrooms': bedrooms,
+            'units': 1,
+            'rent_per_month': rent_per_month,
+            'occupancy_status': 'vacant',
+            'image': 'default.jpg'
+        }
+        if rng.random() >= occupied:
+            yield property_row, None, ()
+            continue
+
+        property_row['occupancy_status'] = 'occupied'
+        lease_days = 30 * payments_per_lease
+        lease_start_date = today - timedelta(days=rng.randint(0, lease_days - 1))
+        tenant_name = rng.choice(TENANT_NAMES)
+        occupancy_row = {
+            'property_id': property_row['property_id'],
+            'tenant_name': tenant_name,
+            'tenant_phone': f"05{rng.randint(0, 99999999):08d}",
+            'tenant_email': f"{tenant_name.lower()}.{i}@example.com",
+            'lease_start_date': lease_start_date,
+            'lease_end_date': lease_start_date + timedelta(days=lease_days),
+            'total_rent': rent_per_month * payments_per_lease,
+            'number_of_payments': payments_per_lease
+        }
+        # Installments already due are mostly paid; the rest are overdue
+        elapsed = (today - lease_start_date).days // 30 + 1
+        statuses = ['paid' if rng.random() < on_time else 'due' for _ in range(elapsed)]
+        yield property_row, occupancy_row, statuses
@@ -0,0 +1,244 @@
+"""Server-side sessions shared by every worker
+
+The session cookie only carries a random session id, signed with SECRET_KEY
+so forged ids are rejected before any lookup. The session data lives in a
+SessionStore:
+
+* SQLiteSessionStore keeps one row per session in its own SQLite file (WAL),
+  so every worker on the host sees the same logins;
+* MemorySessionStore keeps them in a dict, for a single process and tests.
+
+Each process keeps recently used sessions in an LRU (cache.MemoryBackend)
+for SESSION_CACHE_TTL seconds, so an authenticated request normally never
+reaches the store. A session is only written when it changed or when half
+of its lifetime has passed, and expired rows are deleted by sweep(), which
+app.py runs on a PeriodicWorker.
+
+SECRET_KEY must be the same in every worker: load_secret_key() reads it from
+a file in the instance folder, creating it once, when it is not configured.
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+from itsdangerous import BadSignature, Signer
+
+from cache import MemoryBackend
+
+
+def load_secret_key(path):
+    """Read the shared secret key, generating it if no worker has yet"""
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, 'w') as file:
+            file.write(secrets.token_hex(32))
+    with open(path) as file:
+        key = file.read().strip()
+    if not key:
+        # Another worker created the file and has not written it yet
+        time.sleep(0.05)
+        return load_secret_key(path)
+    return key
+
+
+class SessionStore(ABC):
+    """Interface every session store implements; payloads are serialized strings"""
+
+    @abstractmethod
+    def load(self, sid, now):
+        """(payload, expires_at) of an unexpired session, or None"""
+
+    @abstractmethod
+    def save(self, sid, payload, expires_at):
+        ...
+
+    @abstractmethod
+    def delete(self, sid):
+        ...
+
+    @abstractmethod
+    def sweep(self, now):
+        """Delete expired sessions; returns how many were removed"""
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self):
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def load(self, sid, now):
+        entry = self.sessions.get(sid)
+        if entry is None or entry[1] <= now:
+            return None
+        return entry
+
+    def save(self, sid, payload, expires_at):
+        with self.lock:
+            self.sessions[sid] = (payload, expires_at)
+
+    def delete(self, sid):
+        with self.lock:
+            self.sessions.pop(sid, None)
+
+    def sweep(self, now):
+        with self.lock:
+            expired = [sid for sid, (_, expires_at) in self.sessions.items() if expires_at <= now]
+            for sid in expired:
+                del self.sessions[sid]
+        return len(expired)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions table in a separate SQLite file, so logins never wait on application writes"""
+
+    def __init__(self, path):
+        self.path = path
+        # One connection per thread, opened on first use (so never before a fork)
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions '
+                         '(sid TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at)')
+            self.local.conn = conn
+        return conn
+
+    def load(self, sid, now):
+        return self.connection().execute(
+            'SELECT payload, expires_at FROM sessions WHERE sid = ? AND expires_at > ?', (sid, now)
+        ).fetchone()
+
+    def save(self, sid, payload, expires_at):
+        self.connection().execute(
+            'INSERT INTO sessions (sid, payload, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (sid) DO UPDATE SET payload = excluded.payload, expires_at = excluded.expires_at',
+            (sid, payload, expires_at)
+        )
+
+    def delete(self, sid):
+        self.connection().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def sweep(self, now):
+        return self.connection().execute('DELETE FROM sessions WHERE expires_at <= ?', (now,)).rowcount
+
+
+class ServerSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.replaced_sid = None
+
+    def regenerate(self):
+        """Move the data to a fresh session id when the response is saved.
+
+        Call when the privilege level changes (login), so an id planted by
+        someone else before the login never becomes authenticated.
+        """
+        if self.sid is not None:
+            self.replaced_sid = self.sid
+            self.sid = None
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, cache_size=4096, cache_ttl=60):
+        self.store = store
+        # Also holds other per-user data worth keeping next to the session, see app.User.get_cached
+        self.cache = MemoryBackend(max_entries=cache_size)
+        self.cache_ttl = cache_ttl
+
+    def signer(self, app):
+        return Signer(app.secret_key, salt='session-id')
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return ServerSession()
+        try:
+            sid = self.signer(app).unsign(cookie).decode()
+        except BadSignature:
+            return ServerSession()
+
+        now = time.time()
+        entry = self.cache.get(f"session:{sid}")
+        if entry is None or entry[1] <= now:
+            entry = self.store.load(sid, now)
+            if entry is None:
+                return ServerSession()
+            self.cache.set(f"session:{sid}", entry, self.cache_ttl)
+        payload, expires_at = entry
+        return ServerSession(self.serializer.loads(payload), sid=sid, expires_at=expires_at)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+        if session.replaced_sid is not None:
+            self.store.delete(session.replaced_sid)
+            self.cache.delete(f"session:{session.replaced_sid}")
+
+        if not session:
+            if session.modified and session.sid is not None:
+                self.store.delete(session.sid)
+                self.cache.delete(f"session:{session.sid}")
+                response.delete_cookie(name, domain=domain, path=path, secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       partitioned=self.get_cookie_partitioned(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        # Sliding expiry without a write per request: renew once half the lifetime is used
+        if not (session.modified or session.sid is None or session.expires_at - now < lifetime / 2):
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        entry = (self.serializer.dumps(dict(session)), now + lifetime)
+        self.store.save(session.sid, *entry)
+        self.cache.set(f"session:{session.sid}", entry, self.cache_ttl)
+        response.set_cookie(
+            name, self.signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session), httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path, secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app), partitioned=self.get_cookie_partitioned(app)
+        )
+
+    def sweep(self):
+        return self.store.sweep(time.time())
+
+
+def session_interface_from_config(config, instance_path):
+    """ServerSessionInterface over the store named by SESSION_BACKEND ('sqlite' or 'memory')"""
+    backend = config.get('SESSION_BACKEND', 'sqlite')
+    if backend == 'memory':
+        store = MemorySessionStore()
+    elif backend == 'sqlite':
+        path = config.get('SESSION_SQLITE_PATH') or os.path.join(instance_path, 'sessions.db')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        store = SQLiteSessionStore(path)
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    return ServerSessionInterface(store, cache_size=config.get('SESSION_CACHE_SIZE', 4096),
+                                  cache_ttl=config.get('SESSION_CACHE_TTL', 60))
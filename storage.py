@@ -0,0 +1,164 @@
+"""Content-addressed document storage
+
+Uploads are parsed straight off the request stream: every chunk of the file
+part is hashed (SHA-256) and written to a temporary file as it arrives, so
+neither Werkzeug nor the view ever holds the whole file. Once the part ends
+the temporary file is renamed to
+
+    <root>/<hash[0:2]>/<hash[2:4]>/<hash>
+
+Identical files uploaded for different properties therefore share one blob.
+Document rows reference blobs by hash, and the last row referencing a blob
+removes it.
+"""
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+
+StoredBlob = namedtuple('StoredBlob', ['digest', 'size', 'path'])
+
+
+class UploadError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class BlobWriter:
+    """Hash-while-writing sink for one blob; commit() moves it into place"""
+
+    def __init__(self, store):
+        self.store = store
+        fd, self.temp_path = tempfile.mkstemp(dir=store.incoming_dir)
+        self.file = os.fdopen(fd, 'wb')
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.store.max_size:
+            raise UploadError(f"File exceeds the {self.store.max_size / (1024 * 1024):g} MB limit", 413)
+        self.hash.update(data)
+        self.file.write(data)
+
+    def commit(self):
+        self.file.close()
+        digest = self.hash.hexdigest()
+        path = self.store.path_for(digest)
+        if os.path.exists(path):
+            # Same content is already stored
+            os.remove(self.temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.temp_path, path)
+        return StoredBlob(digest, self.size, path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class BlobStore:
+    def __init__(self, root, max_size=25 * 1024 * 1024, chunk_size=64 * 1024, max_field_size=64 * 1024):
+        self.root = root
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.max_field_size = max_field_size
+
+    @property
+    def incoming_dir(self):
+        # Same filesystem as the blobs, so commit() is an atomic rename
+        path = os.path.join(self.root, '.incoming')
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def path_for(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def save(self, stream):
+        """Store a raw byte stream"""
+        writer = BlobWriter(self)
+        try:
+            for chunk in iter(lambda: stream.read(self.chunk_size), b''):
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def delete(self, digest):
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def receive_multipart(self, stream, content_type, file_field='file', accept=None):
+        """Parse a multipart/form-data body, streaming `file_field` into the store.
+
+        Returns (fields, filename, blob). blob is None when the part is
+        missing, empty-named, or its filename is rejected by `accept`; the
+        rejected part's data is discarded without being written.
+        """
+        mimetype, options = parse_options_header(content_type)
+        if mimetype != 'multipart/form-data' or 'boundary' not in options:
+            raise UploadError('Expected a multipart/form-data upload')
+
+        # The decoder's limit bounds its buffer, which also holds the chunk being fed;
+        # form field values are capped separately below
+        decoder = MultipartDecoder(options['boundary'].encode('latin-1'), self.chunk_size + self.max_field_size)
+        fields = {}
+        filename = None
+        blob = None
+        writer = None
+        current_field = None
+        field_data = []
+        field_size = 0
+
+        try:
+            while True:
+                chunk = stream.read(self.chunk_size)
+                decoder.receive_data(chunk or None)
+                event = decoder.next_event()
+                while not isinstance(event, (NeedData, Epilogue)):
+                    if isinstance(event, File) and event.name == file_field and blob is None and writer is None:
+                        filename = event.filename
+                        current_field = None
+                        if filename and (accept is None or accept(filename)):
+                            writer = BlobWriter(self)
+                    elif isinstance(event, (Field, File)):
+                        current_field = event.name if isinstance(event, Field) else None
+                        field_data = []
+                        field_size = 0
+                    elif isinstance(event, Data):
+                        if writer is not None:
+                            writer.write(event.data)
+                            if not event.more_data:
+                                blob = writer.commit()
+                                writer = None
+                        elif current_field is not None:
+                            field_size += len(event.data)
+                            if field_size > self.max_field_size:
+                                raise RequestEntityTooLarge()
+                            field_data.append(event.data)
+                            if not event.more_data:
+                                fields[current_field] = b''.join(field_data).decode('utf-8', 'replace')
+                                current_field = None
+                    event = decoder.next_event()
+                if isinstance(event, Epilogue) or not chunk:
+                    break
+        except RequestEntityTooLarge:
+            raise UploadError('Form field too large', 413)
+        except ValueError as e:
+            raise UploadError(f'Malformed upload: {e}')
+        finally:
+            if writer is not None:
+                writer.abort()
+
+        return fields, filename, blob
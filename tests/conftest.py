@@ -0,0 +1,34 @@
+import pytest
+
+from app import create_app, db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The app on a throwaway SQLite database, with its context pushed"""
+    test_app = create_app(dict(
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'test.db'),
+        UPLOAD_FOLDER=str(tmp_path / 'documents'),
+        RENDITION_FOLDER=str(tmp_path / 'renditions'),
+        SESSION_SQLITE_PATH=str(tmp_path / 'sessions.db'),
+        NOTIFICATION_WORKERS=False,
+        RENDITIONS_ENABLED=False,
+        PASSWORD_HASH_WORKERS=0,
+        TESTING=True
+    ))
+    with test_app.app_context():
+        db.create_all()
+        yield test_app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as a fresh user"""
+    client = app.test_client()
+    client.post('/api/signup', json={
+        'full_name': 'Test User', 'email': 'test@example.com', 'password': 'test', 'phone_number': '0'
+    })
+    client.post('/login', json={'email': 'test@example.com', 'password': 'test'})
+    return client
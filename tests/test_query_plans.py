@@ -0,0 +1,101 @@
+"""Every SELECT issued by a hot GET endpoint must use an index
+
+The statements are captured while the endpoints run against a small
+portfolio, then explained with EXPLAIN QUERY PLAN. A `SCAN <table>` step on
+a model table means a query fell back to reading the whole table.
+"""
+import re
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from app import db
+
+
+HOT_ENDPOINTS = [
+    '/api/dashboard',
+    '/api/properties',
+    '/api/properties/overview',
+    '/api/income',
+    '/api/income/timeseries',
+    '/api/properties/vacant',
+    '/api/properties/{property_id}',
+    '/api/properties/{property_id}/full-details',
+    '/api/properties/{property_id}/income',
+    '/api/properties/{property_id}/documents',
+    '/api/properties/{property_id}/notifications',
+    '/api/notifications/check',
+    '/api/occupants',
+    '/api/occupants/overview',
+    '/api/occupancies/{occupancy_id}',
+    '/api/occupants/{occupancy_id}/payments',
+    '/api/occupants/{occupancy_id}/check-delete',
+    '/api/payments/export',
+]
+
+
+def seed_portfolio(client, properties=4):
+    """Create properties, leases, payments and notifications through the API"""
+    today = date.today()
+    property_ids = []
+    for i in range(properties):
+        response = client.post('/api/properties', json={
+            'property_type': 'apartment', 'street_name': f'Street {i}', 'city': 'Dubai',
+            'size_sqft': 900, 'bedrooms': 2, 'units': 1, 'rent_per_month': 1000
+        })
+        property_ids.append(response.get_json()['property_id'])
+    for property_id in property_ids[:-1]:
+        client.post(f'/api/properties/{property_id}/occupancy', json={
+            'tenant_name': 'Tenant', 'tenant_phone': '0', 'tenant_email': 'tenant@example.com',
+            'lease_start_date': today.strftime('%Y-%m-%d'),
+            'lease_end_date': (today + timedelta(days=365)).strftime('%Y-%m-%d'),
+            'total_rent': 12000, 'number_of_payments': 12, 'payments': [{'status': 'paid'}]
+        })
+        for notification_type in ('payment', 'lease_renewal'):
+            client.post(f'/api/properties/{property_id}/notifications', json={
+                'notification_type': notification_type, 'notification_period': 30
+            })
+    return property_ids
+
+
+def capture_selects(client, urls):
+    """{statement: (url, parameters)} of the SELECTs the GET requests issue"""
+    statements = {}
+    url = None
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            statements.setdefault(statement, (url, tuple(parameters)))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        for url in urls:
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+
+def full_scans(statements):
+    """(url, plan step, statement) for every plan step that scans a model table"""
+    scans = []
+    with db.engine.connect() as conn:
+        for statement, (url, parameters) in statements.items():
+            for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all():
+                detail = row[-1]
+                match = re.match(r'SCAN (\w+)', detail)
+                if match and match.group(1) in db.metadata.tables:
+                    scans.append((url, detail, ' '.join(statement.split())))
+    return scans
+
+
+def test_hot_queries_use_indexes(client):
+    property_ids = seed_portfolio(client)
+    urls = [url.format(property_id=property_ids[0], occupancy_id=1) for url in HOT_ENDPOINTS]
+
+    statements = capture_selects(client, urls)
+    assert statements
+
+    scans = full_scans(statements)
+    assert not scans, '\n'.join(f"{url}: {detail}\n    {statement}" for url, detail, statement in scans)